@@ -0,0 +1,387 @@
+"""
+Offline batch conversion of recorded hand videos into finger angles.
+
+Takes video files and/or directories of images, splits them into chunks and
+runs them across a process pool with one MediaPipe Hands instance per worker.
+Each input produces an .npz file with per-frame finger angles and landmarks
+(NaN where no hand was found or an image could not be read), the source file
+of every row, and a readable flag, suitable for servo trajectories or training.
+
+Usage:
+    python batch_process.py clip1.mp4 clip2.mp4 frames_dir/ -o out/ -j 8
+
+Requirements:
+- opencv-python
+- mediapipe
+- numpy
+"""
+
+import argparse
+import multiprocessing as mp_proc
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Same joints as pc_ver.HandTracker.finger_landmarks
+FINGER_JOINTS = np.array([
+    [2, 3, 4],     # thumb: CMC, MCP, IP
+    [5, 6, 8],     # index: MCP, PIP, TIP
+    [9, 10, 12],   # middle
+    [13, 14, 16],  # ring
+    [17, 18, 20],  # pinky
+])
+NUM_LANDMARKS = 21
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def finger_angles_from_landmarks(landmarks: np.ndarray) -> np.ndarray:
+    """
+    Calculate finger bend angles from landmark arrays
+    Args:
+        landmarks: (..., 21, 3) landmark coordinates
+    Returns:
+        (..., 5) bend angles in degrees, matching pc_ver.HandTracker.get_finger_angles
+    """
+    points = landmarks[..., FINGER_JOINTS, :2]
+    v1 = points[..., 0, :] - points[..., 1, :]
+    v2 = points[..., 2, :] - points[..., 1, :]
+
+    dot = np.sum(v1 * v2, axis=-1)
+    norms = np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos_angle = np.clip(dot / norms, -1.0, 1.0)
+
+    return np.clip(180.0 - np.degrees(np.arccos(cos_angle)), 0.0, 180.0)
+
+
+class Job:
+    """One chunk of frames from a single input"""
+
+    def __init__(self, name: str, source: str, kind: str, start: int, stop: Optional[int],
+                 static_image_mode: bool, chunk_path: str, files: Optional[List[str]] = None):
+        """
+        Args:
+            name: Output name of the input this chunk belongs to
+            source: Video path or image directory
+            kind: 'video' or 'images'
+            start: First frame index
+            stop: One past the last frame index, or None to read to the end
+            static_image_mode: MediaPipe static_image_mode for this chunk
+            chunk_path: Where the worker writes this chunk's arrays
+            files: Image paths for 'images' chunks
+        """
+        self.name = name
+        self.source = source
+        self.kind = kind
+        self.start = start
+        self.stop = stop
+        self.static_image_mode = static_image_mode
+        self.chunk_path = chunk_path
+        self.files = files
+
+
+# Worker state, one copy per pool process
+_worker_hands: Dict[bool, object] = {}
+_worker_options: Dict[str, float] = {}
+
+
+def _init_worker(min_detection_confidence: float, min_tracking_confidence: float):
+    """Pool initializer: keep each worker to one core"""
+    cv2.setNumThreads(1)
+    _worker_options['min_detection_confidence'] = min_detection_confidence
+    _worker_options['min_tracking_confidence'] = min_tracking_confidence
+
+
+def _get_hands(static_image_mode: bool):
+    """
+    Get this worker's Hands instance for the requested mode
+    Args:
+        static_image_mode: MediaPipe static_image_mode
+    Returns:
+        MediaPipe Hands solution
+    """
+    hands = _worker_hands.get(static_image_mode)
+    if hands is None:
+        # Imported here so the parent process never loads the model
+        import mediapipe as mp
+
+        hands = mp.solutions.hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=1,
+            **_worker_options
+        )
+        _worker_hands[static_image_mode] = hands
+    elif not static_image_mode:
+        # Tracking state must not leak from the previous chunk
+        hands.reset()
+    return hands
+
+
+def _iter_frames(job: Job):
+    """Yield BGR frames for a job (None for images that cannot be read)"""
+    if job.kind == 'images':
+        for path in job.files:
+            # Unreadable images still get a row so rows stay aligned with files
+            yield cv2.imread(path)
+        return
+
+    cap = cv2.VideoCapture(job.source)
+    try:
+        if job.start:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, job.start)
+        index = job.start
+        while job.stop is None or index < job.stop:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def _process_job(job: Job) -> Tuple[str, int, int, float]:
+    """
+    Run hand tracking over one chunk and write its arrays to disk
+    Args:
+        job: Chunk to process
+    Returns:
+        Tuple of (name, frames processed, frames with a hand, seconds spent)
+    """
+    start_time = time.perf_counter()
+    hands = _get_hands(job.static_image_mode)
+
+    landmarks = []
+    readable = []
+    detected = 0
+
+    for frame in _iter_frames(job):
+        readable.append(frame is not None)
+        if frame is None:
+            landmarks.append(None)
+            continue
+
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = hands.process(rgb_frame)
+
+        if results.multi_hand_landmarks:
+            hand = results.multi_hand_landmarks[0]
+            landmarks.append([(p.x, p.y, p.z) for p in hand.landmark])
+            detected += 1
+        else:
+            landmarks.append(None)
+
+    points = np.full((len(landmarks), NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+    for i, frame_points in enumerate(landmarks):
+        if frame_points is not None:
+            points[i] = frame_points
+
+    angles = finger_angles_from_landmarks(points).astype(np.float32)
+    # Image chunks record the file behind each row; video rows are frame numbers
+    files = job.files if job.kind == 'images' else [job.source] * len(points)
+    np.savez(job.chunk_path, landmarks=points, angles=angles,
+             frame_index=np.arange(job.start, job.start + len(points)),
+             files=np.array(files, dtype=str), readable=np.array(readable, dtype=bool))
+
+    return job.name, len(points), detected, time.perf_counter() - start_time
+
+
+def _video_frame_count(path: str) -> int:
+    """Get the frame count reported by the container (may be approximate)"""
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else -1
+    finally:
+        cap.release()
+
+
+def plan_jobs(inputs: List[str], output_dir: str, chunk_frames: int,
+              static_mode: str = 'auto') -> Dict[str, List[Job]]:
+    """
+    Split inputs into chunks
+    Args:
+        inputs: Video files and image directories
+        output_dir: Directory receiving the results
+        chunk_frames: Frames per chunk (0 = one chunk per input)
+        static_mode: 'auto' (images static, videos tracked), 'on' or 'off'
+    Returns:
+        Dict of output name -> ordered list of chunks
+    """
+    plan = {}
+
+    for source in inputs:
+        name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+        while name in plan:
+            name += "_"
+
+        if os.path.isdir(source):
+            kind = 'images'
+            files = sorted(
+                os.path.join(source, f) for f in os.listdir(source)
+                if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            total = len(files)
+        elif source.lower().endswith(VIDEO_EXTENSIONS):
+            kind = 'video'
+            files = None
+            total = _video_frame_count(source)
+            if total < 0:
+                print(f"⚠️ Cannot open {source}, skipping")
+                continue
+        else:
+            print(f"⚠️ Unsupported input {source}, skipping")
+            continue
+
+        # Only created once the input is known to be usable
+        chunk_dir = os.path.join(output_dir, f".{name}.chunks")
+        os.makedirs(chunk_dir, exist_ok=True)
+
+        if static_mode == 'auto':
+            static_image_mode = kind == 'images'
+        else:
+            static_image_mode = static_mode == 'on'
+
+        # Frame counts from containers can be short, so the last video chunk
+        # always reads to the end of the file
+        step = chunk_frames if chunk_frames > 0 else max(total, 1)
+        starts = list(range(0, max(total, 1), step))
+        jobs = []
+        for i, start in enumerate(starts):
+            last = i == len(starts) - 1
+            stop = None if (last and kind == 'video') else min(start + step, total)
+            jobs.append(Job(
+                name, source, kind, start, stop, static_image_mode,
+                os.path.join(chunk_dir, f"{i:05d}.npz"),
+                files[start:stop] if files is not None else None
+            ))
+        plan[name] = jobs
+
+    return plan
+
+
+def merge_chunks(name: str, jobs: List[Job], output_dir: str) -> str:
+    """
+    Concatenate a finished input's chunks into one .npz file
+    Args:
+        name: Output name
+        jobs: The input's chunks, in order
+        output_dir: Directory receiving the results
+    Returns:
+        Path of the merged file
+    """
+    parts = [np.load(job.chunk_path) for job in jobs]
+    path = os.path.join(output_dir, f"{name}.npz")
+    np.savez(
+        path,
+        angles=np.concatenate([p['angles'] for p in parts]),
+        landmarks=np.concatenate([p['landmarks'] for p in parts]),
+        frame_index=np.concatenate([p['frame_index'] for p in parts]),
+        files=np.concatenate([p['files'] for p in parts]),
+        readable=np.concatenate([p['readable'] for p in parts]),
+    )
+    for p in parts:
+        p.close()
+    shutil.rmtree(os.path.dirname(jobs[0].chunk_path), ignore_errors=True)
+    return path
+
+
+def run_batch(inputs: List[str], output_dir: str, workers: int = 0,
+              chunk_frames: int = 600, static_mode: str = 'auto',
+              min_detection_confidence: float = 0.7,
+              min_tracking_confidence: float = 0.5) -> Dict[str, str]:
+    """
+    Process inputs across a process pool
+    Args:
+        inputs: Video files and image directories
+        output_dir: Directory receiving the results
+        workers: Number of worker processes (0 = one per CPU)
+        chunk_frames: Frames per chunk (0 = one chunk per input)
+        static_mode: 'auto', 'on' or 'off'
+        min_detection_confidence: MediaPipe detection threshold
+        min_tracking_confidence: MediaPipe tracking threshold
+    Returns:
+        Dict of output name -> result file path
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    plan = plan_jobs(inputs, output_dir, chunk_frames, static_mode)
+    jobs = [job for chunks in plan.values() for job in chunks]
+    if not jobs:
+        print("❌ Nothing to process")
+        return {}
+
+    workers = workers or os.cpu_count() or 1
+    print(f"🚀 {len(plan)} inputs, {len(jobs)} chunks, {workers} workers")
+
+    remaining = {name: len(chunks) for name, chunks in plan.items()}
+    outputs = {}
+    total_frames = 0
+    total_detected = 0
+    start_time = time.perf_counter()
+
+    # MediaPipe is not fork-safe, so always start clean worker processes
+    ctx = mp_proc.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker,
+                  initargs=(min_detection_confidence, min_tracking_confidence)) as pool:
+        for done, (name, frames, detected, seconds) in enumerate(
+                pool.imap_unordered(_process_job, jobs), 1):
+            total_frames += frames
+            total_detected += detected
+            elapsed = time.perf_counter() - start_time
+            print(f"[{done}/{len(jobs)}] {name}: {frames} frames in {seconds:.1f}s "
+                  f"({frames / max(seconds, 1e-9):.1f} fps/worker) | "
+                  f"total {total_frames / max(elapsed, 1e-9):.1f} fps")
+
+            remaining[name] -= 1
+            if remaining[name] == 0:
+                outputs[name] = merge_chunks(name, plan[name], output_dir)
+                print(f"✅ Wrote {outputs[name]}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\n📊 {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / max(elapsed, 1e-9):.1f} fps), "
+          f"hand found in {total_detected}/{total_frames}")
+    return outputs
+
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Convert hand videos or image folders into finger angle arrays")
+    parser.add_argument("inputs", nargs='+', help="Video files or image directories")
+    parser.add_argument("-o", "--output-dir", default="batch_output",
+                        help="Directory for the .npz results")
+    parser.add_argument("-j", "--workers", type=int, default=0,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-frames", type=int, default=600,
+                        help="Frames per chunk; 0 keeps each input in one chunk")
+    parser.add_argument("--static-image-mode", choices=['auto', 'on', 'off'], default='auto',
+                        help="'auto' uses static mode for image folders and tracking for videos")
+    parser.add_argument("--min-detection-confidence", type=float, default=0.7)
+    parser.add_argument("--min-tracking-confidence", type=float, default=0.5)
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main entry point"""
+    args = parse_args()
+    outputs = run_batch(
+        args.inputs,
+        args.output_dir,
+        workers=args.workers,
+        chunk_frames=args.chunk_frames,
+        static_mode=args.static_image_mode,
+        min_detection_confidence=args.min_detection_confidence,
+        min_tracking_confidence=args.min_tracking_confidence,
+    )
+    sys.exit(0 if outputs else 1)
+
+
+if __name__ == "__main__":
+    main()
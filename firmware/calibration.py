@@ -0,0 +1,358 @@
+"""
+Per-user calibration for the hand tracking pipeline.
+
+Records open-hand and fist ranges for each joint, turns them into monotone
+raw-to-servo lookup tables, and applies those tables to all joints at once
+with numpy. Profiles are stored as JSON so an operator can start tracking
+immediately with their saved calibration.
+
+Requirements:
+- numpy
+"""
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+FINGER_NAMES = ['thumb', 'index', 'middle', 'ring', 'pinky']
+
+# Raw angles are sampled on a fixed grid; 0.5° steps keep the table small
+# while linear interpolation between entries keeps the output smooth.
+RAW_MIN = 0.0
+RAW_MAX = 180.0
+LUT_SIZE = 361
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".robohand", "calibration")
+PROFILE_VERSION = 1
+
+
+class CalibrationProfile:
+    """Monotone raw-angle to servo-angle lookup tables, one row per joint"""
+
+    def __init__(self, joint_names: List[str], open_raw: np.ndarray,
+                 closed_raw: np.ndarray, open_servo: float = 0.0,
+                 closed_servo: float = 180.0, name: str = "default"):
+        """
+        Build lookup tables from per-joint calibration ranges
+        Args:
+            joint_names: Name of each joint, in the order angles are supplied
+            open_raw: Raw angle per joint with the hand open
+            closed_raw: Raw angle per joint with the hand in a fist
+            open_servo: Servo angle commanded for an open joint
+            closed_servo: Servo angle commanded for a closed joint
+            name: Profile name used when saving to disk
+        """
+        self.joint_names = list(joint_names)
+        self.open_raw = np.asarray(open_raw, dtype=np.float64)
+        self.closed_raw = np.asarray(closed_raw, dtype=np.float64)
+        self.open_servo = float(open_servo)
+        self.closed_servo = float(closed_servo)
+        self.name = name
+        self.created = time.time()
+
+        if self.open_raw.shape != (len(self.joint_names),) or \
+                self.closed_raw.shape != (len(self.joint_names),):
+            raise ValueError("Calibration ranges must have one value per joint")
+
+        self.grid = np.linspace(RAW_MIN, RAW_MAX, LUT_SIZE)
+        self.tables = self._build_tables()
+        self._rows = np.arange(len(self.joint_names))
+        self._step = (RAW_MAX - RAW_MIN) / (LUT_SIZE - 1)
+
+    @classmethod
+    def from_ranges(cls, ranges: Dict[str, Dict[str, float]],
+                    open_key: str = 'max_angle', closed_key: str = 'min_angle',
+                    **kwargs) -> 'CalibrationProfile':
+        """
+        Build a profile from a {joint: {min_angle, max_angle}} dict
+        Args:
+            ranges: Per-joint calibration ranges
+            open_key: Key holding the open-hand raw angle
+            closed_key: Key holding the fist raw angle
+        Returns:
+            Calibration profile
+        """
+        names = list(ranges.keys())
+        open_raw = [ranges[n][open_key] for n in names]
+        closed_raw = [ranges[n][closed_key] for n in names]
+        return cls(names, open_raw, closed_raw, **kwargs)
+
+    @classmethod
+    def from_samples(cls, joint_names: List[str], open_samples: np.ndarray,
+                     closed_samples: np.ndarray, **kwargs) -> 'CalibrationProfile':
+        """
+        Build a profile from recorded open-hand and fist samples
+        Args:
+            joint_names: Name of each joint
+            open_samples: (frames, joints) raw angles recorded with the hand open
+            closed_samples: (frames, joints) raw angles recorded in a fist
+        Returns:
+            Calibration profile
+        """
+        open_samples = np.asarray(open_samples, dtype=np.float64)
+        closed_samples = np.asarray(closed_samples, dtype=np.float64)
+        if len(open_samples) == 0 or len(closed_samples) == 0:
+            raise ValueError("Calibration needs samples for both hand poses")
+
+        # The median ignores the odd mis-tracked frame while the hand settles
+        open_raw = np.median(open_samples, axis=0)
+        closed_raw = np.median(closed_samples, axis=0)
+        return cls(joint_names, open_raw, closed_raw, **kwargs)
+
+    def _build_tables(self) -> np.ndarray:
+        """
+        Build one monotone lookup table per joint
+        Returns:
+            (joints, LUT_SIZE) array of servo angles
+        """
+        tables = np.empty((len(self.joint_names), LUT_SIZE))
+
+        for i in range(len(self.joint_names)):
+            lo, hi = self.open_raw[i], self.closed_raw[i]
+            y_lo, y_hi = self.open_servo, self.closed_servo
+
+            # np.interp needs increasing knots
+            if lo > hi:
+                lo, hi = hi, lo
+                y_lo, y_hi = y_hi, y_lo
+
+            # A joint that barely moved during calibration would give a step
+            # function, so keep a minimum span around its midpoint
+            if hi - lo < 1.0:
+                mid = (lo + hi) / 2
+                lo, hi = mid - 0.5, mid + 0.5
+
+            tables[i] = np.interp(self.grid, [lo, hi], [y_lo, y_hi])
+
+        return tables
+
+    def apply(self, raw_angles) -> np.ndarray:
+        """
+        Map raw angles for every joint to servo angles
+        Args:
+            raw_angles: Raw angle per joint
+        Returns:
+            Servo angle per joint
+        """
+        raw = np.clip(np.asarray(raw_angles, dtype=np.float64), RAW_MIN, RAW_MAX)
+        pos = (raw - RAW_MIN) / self._step
+        idx = np.minimum(pos.astype(np.intp), LUT_SIZE - 2)
+        frac = pos - idx
+
+        lower = self.tables[self._rows, idx]
+        upper = self.tables[self._rows, idx + 1]
+        return lower + (upper - lower) * frac
+
+    def ranges(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get calibration ranges for display
+        Returns:
+            {joint: {'open': raw, 'closed': raw}}
+        """
+        return {
+            name: {'open': float(o), 'closed': float(c)}
+            for name, o, c in zip(self.joint_names, self.open_raw, self.closed_raw)
+        }
+
+    def to_dict(self) -> dict:
+        """Serialize profile to a JSON-compatible dict"""
+        return {
+            'version': PROFILE_VERSION,
+            'name': self.name,
+            'created': self.created,
+            'joint_names': self.joint_names,
+            'open_raw': self.open_raw.tolist(),
+            'closed_raw': self.closed_raw.tolist(),
+            'open_servo': self.open_servo,
+            'closed_servo': self.closed_servo,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'CalibrationProfile':
+        """Rebuild a profile from a dict produced by to_dict"""
+        if data.get('version') != PROFILE_VERSION:
+            raise ValueError(f"Unsupported calibration profile version: {data.get('version')}")
+
+        profile = cls(
+            data['joint_names'],
+            data['open_raw'],
+            data['closed_raw'],
+            open_servo=data['open_servo'],
+            closed_servo=data['closed_servo'],
+            name=data['name'],
+        )
+        profile.created = data.get('created', profile.created)
+        return profile
+
+
+def profile_path(name: str, profile_dir: str = DEFAULT_PROFILE_DIR) -> str:
+    """
+    Get the file path of a named profile
+    Args:
+        name: Profile name
+        profile_dir: Directory holding profiles
+    Returns:
+        Path to the profile JSON file
+    """
+    return os.path.join(profile_dir, f"{name}.json")
+
+
+def save_profile(profile: CalibrationProfile,
+                 profile_dir: str = DEFAULT_PROFILE_DIR) -> str:
+    """
+    Save a profile to disk
+    Args:
+        profile: Profile to save
+        profile_dir: Directory holding profiles
+    Returns:
+        Path the profile was written to
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    path = profile_path(profile.name, profile_dir)
+
+    # Write to a temp file first so a crash never leaves a half-written profile
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def load_profile(name: str,
+                 profile_dir: str = DEFAULT_PROFILE_DIR) -> Optional[CalibrationProfile]:
+    """
+    Load a profile from disk
+    Args:
+        name: Profile name
+        profile_dir: Directory holding profiles
+    Returns:
+        The profile, or None if it does not exist or cannot be read
+    """
+    path = profile_path(name, profile_dir)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as f:
+            return CalibrationProfile.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Could not load calibration profile {path}: {e}")
+        return None
+
+
+def list_profiles(profile_dir: str = DEFAULT_PROFILE_DIR) -> List[str]:
+    """
+    List saved profile names
+    Args:
+        profile_dir: Directory holding profiles
+    Returns:
+        Sorted list of profile names
+    """
+    if not os.path.isdir(profile_dir):
+        return []
+    return sorted(f[:-5] for f in os.listdir(profile_dir) if f.endswith('.json'))
+
+
+class CalibrationSession:
+    """
+    Interactive calibration routine driven one frame at a time
+
+    The operator holds the hand open, then makes a fist, for a few seconds
+    each. Frames are fed in from the main loop so the camera view keeps
+    updating while calibration runs.
+    """
+
+    PHASES = ['open', 'closed']
+    PROMPTS = {
+        'open': "Hold hand OPEN, fingers straight",
+        'closed': "Make a tight FIST",
+    }
+
+    def __init__(self, joint_names: List[str] = FINGER_NAMES,
+                 phase_duration: float = 3.0, settle_time: float = 1.0):
+        """
+        Initialize calibration session
+        Args:
+            joint_names: Name of each joint
+            phase_duration: Seconds of samples recorded per pose
+            settle_time: Seconds ignored at the start of each pose
+        """
+        self.joint_names = list(joint_names)
+        self.phase_duration = phase_duration
+        self.settle_time = settle_time
+
+        self.samples = {phase: [] for phase in self.PHASES}
+        self.phase_index = 0
+        self.phase_start = time.time()
+
+    @property
+    def phase(self) -> Optional[str]:
+        """Current pose being recorded, or None when finished"""
+        if self.phase_index < len(self.PHASES):
+            return self.PHASES[self.phase_index]
+        return None
+
+    @property
+    def done(self) -> bool:
+        """True once every pose has been recorded"""
+        return self.phase is None
+
+    @property
+    def prompt(self) -> str:
+        """Instruction to show the operator"""
+        if self.done:
+            return "Calibration complete"
+        remaining = self.phase_duration + self.settle_time - (time.time() - self.phase_start)
+        return f"{self.PROMPTS[self.phase]} ({max(0.0, remaining):.1f}s)"
+
+    def update(self, raw_angles: Optional[List[float]],
+               now: Optional[float] = None) -> bool:
+        """
+        Feed one frame of raw angles
+        Args:
+            raw_angles: Raw angle per joint, or None if no hand was detected
+            now: Optional timestamp override
+        Returns:
+            True once calibration has finished
+        """
+        if self.done:
+            return True
+
+        now = time.time() if now is None else now
+        elapsed = now - self.phase_start
+
+        if raw_angles is not None and elapsed >= self.settle_time:
+            self.samples[self.phase].append(list(raw_angles))
+
+        if elapsed >= self.settle_time + self.phase_duration:
+            if not self.samples[self.phase]:
+                # No hand seen for the whole pose; record it again
+                print(f"⚠️ No hand detected during '{self.phase}' pose, retrying")
+            else:
+                self.phase_index += 1
+            self.phase_start = now
+
+        return self.done
+
+    def build_profile(self, name: str = "default", **kwargs) -> CalibrationProfile:
+        """
+        Build a profile from the recorded samples
+        Args:
+            name: Profile name
+        Returns:
+            Calibration profile
+        """
+        if not self.done:
+            raise RuntimeError("Calibration has not finished")
+
+        return CalibrationProfile.from_samples(
+            self.joint_names,
+            np.array(self.samples['open']),
+            np.array(self.samples['closed']),
+            name=name,
+            **kwargs
+        )
@@ -0,0 +1,374 @@
+"""
+Low-latency camera capture for the hand tracking loop.
+
+Wraps cv2.VideoCapture so the camera is opened with an explicit pixel format
+(MJPG or YUYV), the smallest driver buffer queue and optional fixed exposure,
+then reports what the driver actually negotiated. Frames are grabbed and
+retrieved separately so stale queued frames are skipped without being
+decoded, and the interval between delivered frames is measured.
+
+A video file can stand in for the camera: it is played back in real time at
+its own frame rate, dropping frames when the consumer falls behind, just
+like a live device would. open_capture() also accepts an ESP32-CAM stream
+URL (see mjpeg_stream.py).
+
+Requirements:
+- opencv-python
+- numpy
+"""
+
+import sys
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+PIXEL_FORMATS = ('MJPG', 'YUYV')
+
+
+def fourcc_to_str(value: float) -> str:
+    """
+    Decode a CAP_PROP_FOURCC value
+    Args:
+        value: Value returned by cap.get(cv2.CAP_PROP_FOURCC)
+    Returns:
+        Four character code, e.g. 'MJPG'
+    """
+    code = int(value)
+    if code <= 0:
+        return "?"
+    return code.to_bytes(4, 'little').decode('ascii', errors='replace')
+
+
+class CameraCapture:
+    """Camera or video-file capture tuned for lowest latency"""
+
+    def __init__(self, source: Union[int, str] = 0, width: int = 640, height: int = 480,
+                 fps: float = 30, pixel_format: Optional[str] = 'MJPG',
+                 buffer_size: int = 1, exposure: Optional[float] = None,
+                 realtime: bool = True, stats_window: int = 120):
+        """
+        Initialize capture settings
+        Args:
+            source: Camera index or path to a recorded video
+            width: Requested frame width
+            height: Requested frame height
+            fps: Requested frame rate
+            pixel_format: 'MJPG', 'YUYV' or None to keep the driver default
+            buffer_size: Driver frame queue length (1 = newest frame only)
+            exposure: Manual exposure value, or None for auto exposure
+            realtime: Play video files at their own frame rate, dropping late frames
+            stats_window: Number of frame intervals kept for statistics
+        """
+        if pixel_format is not None and pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format: {pixel_format}")
+
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.pixel_format = pixel_format
+        self.buffer_size = buffer_size
+        self.exposure = exposure
+        self.realtime = realtime
+
+        self.cap = None
+        self.is_file = isinstance(source, str) and not source.isdigit()
+        self.negotiated: Dict[str, object] = {}
+
+        # Delivery statistics
+        self.intervals = deque(maxlen=stats_window)
+        self.last_frame_time = None
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+        self.last_capture_time = None
+        self.last_grab_time = None
+        self.last_frame_age: Optional[float] = None
+        self.last_wait_time = 0.0  # Seconds the last read slept for file pacing
+
+        # Video file playback clock
+        self.file_fps = 0.0
+        self.file_start_time = None
+        self.file_position = 0
+
+    def open(self) -> bool:
+        """
+        Open the source and negotiate capture settings
+        Returns:
+            True if the source opened
+        """
+        source = int(self.source) if isinstance(self.source, str) and self.source.isdigit() \
+            else self.source
+
+        if self.is_file:
+            self.cap = cv2.VideoCapture(source)
+        elif sys.platform.startswith('linux'):
+            self.cap = cv2.VideoCapture(source, cv2.CAP_V4L2)
+        else:
+            self.cap = cv2.VideoCapture(source)
+
+        if not self.cap.isOpened():
+            return False
+
+        if self.is_file:
+            self.file_fps = self.cap.get(cv2.CAP_PROP_FPS) or self.fps
+        else:
+            self._configure_camera()
+
+        self.negotiated = self._read_back()
+        return True
+
+    def _configure_camera(self):
+        """Request pixel format, size, rate, buffering and exposure"""
+        # V4L2 picks the format before the size, so FOURCC must be set first;
+        # otherwise YUYV can cap the frame rate at higher resolutions
+        if self.pixel_format:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*self.pixel_format))
+
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+
+        # Not every backend honours this; the read back below shows the result
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+
+        if self.exposure is not None:
+            # V4L2: 1 = manual exposure, 3 = aperture priority (auto)
+            self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 1)
+            self.cap.set(cv2.CAP_PROP_EXPOSURE, self.exposure)
+
+        if self.pixel_format == 'MJPG' and fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)) != 'MJPG':
+            print("⚠️ Camera refused MJPG, falling back to YUYV")
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+
+    def _read_back(self) -> Dict[str, object]:
+        """
+        Query what the backend actually negotiated
+        Returns:
+            Dict of backend, pixel format, size, frame rate and buffer size
+        """
+        try:
+            backend = self.cap.getBackendName()
+        except cv2.error:
+            backend = "unknown"
+
+        return {
+            'backend': backend,
+            'source': "file" if self.is_file else "camera",
+            'pixel_format': fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            'width': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self.file_fps if self.is_file else self.cap.get(cv2.CAP_PROP_FPS),
+            'buffer_size': int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+
+    def describe(self) -> str:
+        """Get a one-line summary of the negotiated mode"""
+        n = self.negotiated
+        if not n:
+            return "not opened"
+        return (f"{n['backend']} {n['source']} {n['width']}x{n['height']} "
+                f"{n['pixel_format']} @ {n['fps']:.1f} fps, buffer {n['buffer_size']}")
+
+    def isOpened(self) -> bool:
+        """Match the cv2.VideoCapture interface"""
+        return self.cap is not None and self.cap.isOpened()
+
+    def _frame_age(self) -> Optional[float]:
+        """
+        Get how long ago the grabbed frame was captured, from the driver's
+        buffer timestamp (V4L2 stamps buffers with CLOCK_MONOTONIC)
+        Returns:
+            Age in seconds, or None if the backend has no usable timestamp
+        """
+        if not hasattr(time, 'CLOCK_MONOTONIC'):
+            return None
+        stamp = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if stamp <= 0:
+            return None
+        age = time.clock_gettime(time.CLOCK_MONOTONIC) - stamp / 1000
+        # Other backends report a stream position here, not a capture time
+        if not 0 <= age < 1.0:
+            return None
+        return age
+
+    def _grab_latest_camera(self) -> bool:
+        """
+        Grab from a live camera, skipping frames already queued by the driver
+        Returns:
+            True if a frame was grabbed
+        """
+        frame_interval = 1.0 / max(self.negotiated.get('fps') or self.fps, 1.0)
+        now = time.perf_counter()
+        elapsed = now - self.last_grab_time if self.last_grab_time is not None else 0.0
+
+        if not self.cap.grab():
+            return False
+
+        age = self._frame_age()
+        if age is not None:
+            # Older than one frame interval means a newer frame is already waiting
+            for _ in range(max(self.buffer_size, 1)):
+                if age is None or age <= frame_interval * 1.5:
+                    break
+                if not self.cap.grab():
+                    return False
+                self.frames_dropped += 1
+                age = self._frame_age()
+        else:
+            # No timestamps: the driver queued at most one frame per interval
+            # since the last grab, up to its buffer size; keep only the newest
+            queued = min(int(elapsed / frame_interval), max(self.buffer_size, 1))
+            for _ in range(queued - 1):
+                if not self.cap.grab():
+                    return False
+                self.frames_dropped += 1
+
+        self.last_grab_time = time.perf_counter()
+        self.last_frame_age = age
+        return True
+
+    def _grab_latest_file(self) -> bool:
+        """
+        Grab from a video file as if it were a live camera
+        Returns:
+            True if a frame was grabbed
+        """
+        if not self.realtime:
+            ok = self.cap.grab()
+            self.file_position += ok
+            return ok
+
+        now = time.perf_counter()
+        if self.file_start_time is None:
+            self.file_start_time = now
+
+        # Wait for the next frame to "arrive", or skip the ones already missed
+        due = int((now - self.file_start_time) * self.file_fps)
+        if due < self.file_position:
+            self.last_wait_time = (self.file_position - due) / self.file_fps
+            time.sleep(self.last_wait_time)
+            due = self.file_position
+
+        while self.file_position < due:
+            if not self.cap.grab():
+                return False
+            self.file_position += 1
+            self.frames_dropped += 1
+
+        ok = self.cap.grab()
+        self.file_position += ok
+        return ok
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Read the newest available frame
+        The time the frame was grabbed is kept in last_capture_time.
+        Returns:
+            Tuple of (success, frame)
+        """
+        if self.cap is None:
+            return False, None
+
+        self.last_frame_age = None
+        self.last_wait_time = 0.0
+        ok = self._grab_latest_file() if self.is_file else self._grab_latest_camera()
+        if not ok:
+            return False, None
+        # Back-date to the sensor time when the driver reports it
+        self.last_capture_time = time.perf_counter() - (self.last_frame_age or 0.0)
+
+        ok, frame = self.cap.retrieve()
+        if not ok:
+            return False, None
+
+        now = time.perf_counter()
+        if self.last_frame_time is not None:
+            self.intervals.append(now - self.last_frame_time)
+        self.last_frame_time = now
+        self.frames_delivered += 1
+
+        return True, frame
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get delivered frame interval statistics
+        Returns:
+            Dict with mean/p50/p95 interval in ms, delivered fps and frame counts
+        """
+        if not self.intervals:
+            return {'frames': self.frames_delivered, 'dropped': self.frames_dropped}
+
+        intervals_ms = np.array(self.intervals) * 1000
+        mean_ms = float(intervals_ms.mean())
+        return {
+            'frames': self.frames_delivered,
+            'dropped': self.frames_dropped,
+            'interval_mean_ms': mean_ms,
+            'interval_p50_ms': float(np.percentile(intervals_ms, 50)),
+            'interval_p95_ms': float(np.percentile(intervals_ms, 95)),
+            'delivered_fps': 1000.0 / mean_ms if mean_ms > 0 else 0.0,
+        }
+
+    def release(self):
+        """Release the capture device"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def open_capture(source, **kwargs):
+    """
+    Create the capture object for a source
+    Args:
+        source: Camera index, video path, or ESP32-CAM stream URL (http://...)
+        **kwargs: CameraCapture settings (ignored for streams)
+    Returns:
+        CameraCapture or MJPEGStream, not yet opened
+    """
+    if isinstance(source, str) and source.startswith(('http://', 'https://')):
+        from mjpeg_stream import MJPEGStream
+
+        return MJPEGStream(source)
+    return CameraCapture(source, **kwargs)
+
+
+def main():
+    """Open a source, print the negotiated mode and measure delivery"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check camera capture settings and latency")
+    parser.add_argument("--source", default="0", help="Camera index or video file")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--pixel-format", choices=PIXEL_FORMATS, default='MJPG')
+    parser.add_argument("--exposure", type=float, default=None)
+    parser.add_argument("--frames", type=int, default=300, help="Frames to measure")
+    args = parser.parse_args()
+
+    capture = CameraCapture(args.source, args.width, args.height, args.fps,
+                            pixel_format=args.pixel_format, exposure=args.exposure,
+                            stats_window=args.frames)
+    if not capture.open():
+        print(f"❌ Cannot open {args.source}")
+        sys.exit(1)
+
+    print(f"✅ {capture.describe()}")
+    for _ in range(args.frames):
+        ok, _ = capture.read()
+        if not ok:
+            break
+    capture.release()
+
+    for key, value in capture.stats().items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,570 @@
+"""
+Multi-channel EMG ingestion fused with vision finger angles.
+
+The EMG board streams fixed-size little-endian binary frames at ~1 kHz:
+    uint16 sync (0xA55A) | uint16 sample counter | int16 x channels
+A background thread reads whatever bytes have arrived, decodes every whole
+frame in one numpy call and copies the block into a preallocated ring buffer
+with per-sample timestamps, so there is no per-sample Python work and the
+vision loop is never blocked.
+
+EMGFeatures keeps windowed RMS, MAV and zero-crossing counts up to date
+incrementally as blocks arrive, and can also compute them for a window
+ending at any past time. FusionRecorder pairs each camera frame's capture
+time with the EMG features for the same moment for training data.
+
+Sources: a serial port, or a recording (.bin in the wire format, or an .npy
+array of samples x channels) replayed in real time.
+
+Requirements:
+- numpy
+- pyserial (for live serial input)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SYNC_WORD = 0xA55A
+DEFAULT_SAMPLE_RATE = 1000.0
+DEFAULT_CHANNELS = 9
+
+
+def frame_dtype(channels: int) -> np.dtype:
+    """Structured dtype of one wire frame"""
+    return np.dtype([('sync', '<u2'), ('counter', '<u2'), ('ch', '<i2', (channels,))])
+
+
+def encode_frames(samples: np.ndarray, start_counter: int = 0) -> bytes:
+    """
+    Encode samples in the wire format (for recordings and tests)
+    Args:
+        samples: (n, channels) integer samples
+        start_counter: Counter value of the first sample
+    Returns:
+        Encoded bytes
+    """
+    samples = np.asarray(samples)
+    frames = np.empty(len(samples), dtype=frame_dtype(samples.shape[1]))
+    frames['sync'] = SYNC_WORD
+    frames['counter'] = (start_counter + np.arange(len(samples))) & 0xFFFF
+    frames['ch'] = samples
+    return frames.tobytes()
+
+
+class FrameDecoder:
+    """Turns a byte stream into blocks of samples, resynchronising if needed"""
+
+    def __init__(self, channels: int):
+        self.dtype = frame_dtype(channels)
+        self.frame_size = self.dtype.itemsize
+        self.sync_bytes = SYNC_WORD.to_bytes(2, 'little')
+        self.buffer = bytearray()
+        self.last_counter: Optional[int] = None
+        self.dropped_samples = 0
+        self.resyncs = 0
+
+    def feed(self, data: bytes) -> np.ndarray:
+        """
+        Decode all complete frames in the data received so far
+        Args:
+            data: Newly received bytes
+        Returns:
+            (n, channels) int16 samples
+        """
+        self.buffer += data
+        blocks = []
+
+        while len(self.buffer) >= self.frame_size:
+            count = len(self.buffer) // self.frame_size
+            frames = np.frombuffer(self.buffer, dtype=self.dtype, count=count)
+
+            # Take the run of frames that are still aligned to the sync word
+            bad = np.flatnonzero(frames['sync'] != SYNC_WORD)
+            good = count if len(bad) == 0 else bad[0]
+            if good:
+                blocks.append(self._check_counter(frames[:good]))
+                del frames
+                del self.buffer[:good * self.frame_size]
+                continue
+
+            # Out of step: skip to the next sync word
+            del frames
+            self.resyncs += 1
+            index = self.buffer.find(self.sync_bytes, 1)
+            if index < 0:
+                del self.buffer[:-1]
+                break
+            del self.buffer[:index]
+
+        if not blocks:
+            return np.empty((0, self.dtype['ch'].shape[0]), dtype=np.int16)
+        return np.concatenate(blocks)
+
+    def _check_counter(self, frames: np.ndarray) -> np.ndarray:
+        """Count samples lost in transit from gaps in the counter"""
+        counters = frames['counter'].astype(np.int64)
+        if self.last_counter is not None:
+            counters = np.concatenate(([self.last_counter], counters))
+        gaps = (np.diff(counters) - 1) % 65536
+        self.dropped_samples += int(gaps.sum())
+        self.last_counter = int(frames['counter'][-1])
+        return frames['ch'].copy()
+
+
+class RingBuffer:
+    """Preallocated ring of (timestamp, samples) rows"""
+
+    def __init__(self, capacity: int, channels: int):
+        """
+        Args:
+            capacity: Number of samples kept
+            channels: Samples per row
+        """
+        self.capacity = capacity
+        self.channels = channels
+        self.data = np.zeros((capacity, channels), dtype=np.float32)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.total = 0  # Samples ever written
+        self.lock = threading.Lock()
+
+    def write(self, samples: np.ndarray, times: np.ndarray):
+        """Append a block, overwriting the oldest samples"""
+        n = len(samples)
+        if n > self.capacity:
+            samples, times = samples[-self.capacity:], times[-self.capacity:]
+            n = self.capacity
+
+        with self.lock:
+            start = self.total % self.capacity
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            self.times[start:start + first] = times[:first]
+            if first < n:
+                self.data[:n - first] = samples[first:]
+                self.times[:n - first] = times[first:]
+            self.total += n
+
+    def _indices(self, end: int, count: int) -> np.ndarray:
+        """Ring positions of the count samples before absolute index end"""
+        return np.arange(end - count, end) % self.capacity
+
+    def latest(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the newest samples
+        Returns:
+            Tuple of (times, samples), oldest first
+        """
+        with self.lock:
+            count = min(count, self.total, self.capacity)
+            idx = self._indices(self.total, count)
+            return self.times[idx], self.data[idx]
+
+    def window_before(self, t: float, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the samples ending at time t
+        Args:
+            t: perf_counter time
+            count: Number of samples
+        Returns:
+            Tuple of (times, samples), oldest first; may be shorter than count
+        """
+        with self.lock:
+            available = min(self.total, self.capacity)
+            if available == 0:
+                return self.times[:0], self.data[:0]
+            oldest = self.total - available
+            idx = self._indices(self.total, available)
+            # Timestamps increase along idx, so a binary search finds t
+            end = int(np.searchsorted(self.times[idx], t, side='right'))
+            start = max(0, end - count)
+            idx = self._indices(oldest + end, end - start)
+            return self.times[idx], self.data[idx]
+
+
+def compute_features(samples: np.ndarray, zc_threshold: float = 0.0,
+                     previous: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Compute window features for every channel
+    Args:
+        samples: (window, channels) baseline-removed samples
+        zc_threshold: Minimum step between samples counted as a zero crossing
+        previous: (channels,) sample just before the window, if there is one
+    Returns:
+        Dict of 'rms', 'mav' and 'zc' arrays, one value per channel
+    """
+    if len(samples) == 0:
+        zeros = np.zeros(samples.shape[1], dtype=np.float32)
+        return {'rms': zeros, 'mav': zeros, 'zc': zeros}
+
+    # A crossing belongs to the sample that ends it, as in EMGFeatures, so
+    # the step into the window's first sample counts too
+    extended = samples if previous is None else np.concatenate(([previous], samples))
+    crossings = _zero_crossings(extended[:-1], extended[1:], zc_threshold)
+    return {
+        'rms': np.sqrt(np.mean(np.square(samples, dtype=np.float64), axis=0)).astype(np.float32),
+        'mav': np.mean(np.abs(samples), axis=0, dtype=np.float64).astype(np.float32),
+        'zc': crossings.sum(axis=0).astype(np.float32),
+    }
+
+
+def _zero_crossings(previous: np.ndarray, current: np.ndarray, threshold: float) -> np.ndarray:
+    """Mark sign changes between consecutive samples that exceed the threshold"""
+    return (previous * current < 0) & (np.abs(current - previous) >= threshold)
+
+
+class EMGFeatures:
+    """
+    Windowed RMS, MAV and zero-crossing features kept up to date per block
+
+    Running sums are adjusted by the samples entering and leaving the window,
+    so each update costs O(block) rather than O(window), and are rebuilt now
+    and then to stop floating point drift.
+    """
+
+    REBUILD_EVERY = 1000  # blocks
+
+    def __init__(self, channels: int, window: int = 200, zc_threshold: float = 0.0,
+                 baseline_alpha: float = 0.01):
+        """
+        Args:
+            channels: Number of EMG channels
+            window: Samples per feature window (200 = 200ms at 1 kHz)
+            zc_threshold: Minimum step counted as a zero crossing
+            baseline_alpha: Per-block weight of the DC baseline estimate
+        """
+        self.channels = channels
+        self.window = window
+        self.zc_threshold = zc_threshold
+        self.baseline_alpha = baseline_alpha
+
+        self.baseline: Optional[np.ndarray] = None
+        self.history = RingBuffer(window + 1, channels)  # Baseline-removed samples
+        self.sum_sq = np.zeros(channels, dtype=np.float64)
+        self.sum_abs = np.zeros(channels, dtype=np.float64)
+        self.sum_zc = np.zeros(channels, dtype=np.float64)
+        self.count = 0
+        self.updates = 0
+        self.lock = threading.Lock()
+
+    def remove_baseline(self, block: np.ndarray) -> np.ndarray:
+        """Subtract the slowly tracked DC offset of each channel"""
+        block_mean = block.mean(axis=0)
+        if self.baseline is None:
+            self.baseline = block_mean.astype(np.float64)
+        else:
+            self.baseline += self.baseline_alpha * (block_mean - self.baseline)
+        return (block - self.baseline).astype(np.float32)
+
+    def update(self, block: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Add a block of raw samples
+        Args:
+            block: (n, channels) raw samples
+            times: (n,) sample timestamps
+        Returns:
+            The whole baseline-removed block
+        """
+        cleaned = self.remove_baseline(block)
+        if len(cleaned) > self.window:
+            # The block replaces the whole window: keep its newest samples
+            # (plus the one before them, for crossings) and start the sums afresh
+            with self.lock:
+                self.history.write(cleaned[-self.window - 1:], times[-self.window - 1:])
+                self.count = self.window
+                self.updates += 1
+                self._rebuild()
+            return cleaned
+
+        block = cleaned
+        with self.lock:
+            # Previous sample, so crossings at the block boundary count too
+            _, prev = self.history.latest(1)
+            _, leaving = self.history.latest(self.window)
+            n_leave = max(0, len(leaving) + len(block) - self.window)
+            leaving = leaving[:n_leave]
+
+            self.sum_sq += np.sum(np.square(block, dtype=np.float64), axis=0)
+            self.sum_abs += np.sum(np.abs(block), axis=0, dtype=np.float64)
+            joined = np.concatenate((prev, block)) if len(prev) else block
+            self.sum_zc += _zero_crossings(joined[:-1], joined[1:], self.zc_threshold).sum(axis=0)
+
+            if n_leave:
+                self.sum_sq -= np.sum(np.square(leaving, dtype=np.float64), axis=0)
+                self.sum_abs -= np.sum(np.abs(leaving), axis=0, dtype=np.float64)
+                # A crossing leaves with the sample that starts it
+                _, old = self.history.latest(self.window + 1)
+                old = old[:n_leave + 1] if len(old) > self.window else old[:n_leave]
+                if len(old) > 1:
+                    self.sum_zc -= _zero_crossings(old[:-1], old[1:],
+                                                   self.zc_threshold).sum(axis=0)
+
+            self.history.write(block, times)
+            self.count = min(self.window, self.count + len(block))
+
+            self.updates += 1
+            if self.updates % self.REBUILD_EVERY == 0:
+                self._rebuild()
+        return cleaned
+
+    def _rebuild(self):
+        """Recompute the running sums from the window (lock held)"""
+        # Crossings are counted into the sample that ends them, so the one
+        # before the window is needed too
+        _, extended = self.history.latest(self.window + 1)
+        samples = extended[-self.window:]
+        self.sum_sq = np.sum(np.square(samples, dtype=np.float64), axis=0)
+        self.sum_abs = np.sum(np.abs(samples), axis=0, dtype=np.float64)
+        self.sum_zc = _zero_crossings(extended[:-1], extended[1:],
+                                      self.zc_threshold).sum(axis=0).astype(np.float64)
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """
+        Get features for the newest window
+        Returns:
+            Dict of 'rms', 'mav' and 'zc' arrays, one value per channel
+        """
+        with self.lock:
+            n = max(self.count, 1)
+            return {
+                'rms': np.sqrt(np.maximum(self.sum_sq, 0) / n).astype(np.float32),
+                'mav': (self.sum_abs / n).astype(np.float32),
+                'zc': self.sum_zc.astype(np.float32),
+            }
+
+
+class SerialEMGSource:
+    """Reads raw wire-format bytes from a serial port"""
+
+    def __init__(self, port: str, baudrate: int = 921600):
+        import serial
+
+        self.connection = serial.Serial(port, baudrate, timeout=0.02)
+
+    def read(self) -> bytes:
+        """Block briefly and return whatever bytes have arrived"""
+        waiting = self.connection.in_waiting
+        return self.connection.read(max(waiting, 1))
+
+    def close(self):
+        self.connection.close()
+
+
+class FileEMGSource:
+    """Replays a recording in real time, a few milliseconds per read"""
+
+    def __init__(self, path: str, channels: int, sample_rate: float = DEFAULT_SAMPLE_RATE,
+                 block_ms: float = 10.0, loop: bool = False):
+        """
+        Args:
+            path: .bin file in the wire format, or .npy array of samples x channels
+            channels: Number of channels
+            sample_rate: Samples per second
+            block_ms: Milliseconds of samples returned per read
+            loop: Start again at the end of the recording
+        """
+        if path.endswith('.npy'):
+            samples = np.load(path)
+            if samples.ndim != 2 or samples.shape[1] != channels:
+                raise ValueError(f"{path} has shape {samples.shape}, expected (n, {channels})")
+            self.data = encode_frames(samples.astype(np.int16))
+        else:
+            with open(path, 'rb') as f:
+                self.data = f.read()
+
+        frame_size = frame_dtype(channels).itemsize
+        self.block_bytes = max(1, int(sample_rate * block_ms / 1000)) * frame_size
+        self.block_time = self.block_bytes / frame_size / sample_rate
+        self.loop = loop
+        self.position = 0
+        self.next_time = None
+
+    def read(self) -> bytes:
+        """Wait for the next block's time and return it (empty at the end)"""
+        now = time.perf_counter()
+        if self.next_time is None:
+            self.next_time = now
+        elif self.next_time > now:
+            time.sleep(self.next_time - now)
+        self.next_time += self.block_time
+
+        if self.position >= len(self.data):
+            if not self.loop:
+                return b""
+            self.position = 0
+        chunk = self.data[self.position:self.position + self.block_bytes]
+        self.position += len(chunk)
+        return chunk
+
+    def close(self):
+        pass
+
+
+class EMGIngest:
+    """Background EMG ingestion into a ring buffer with live features"""
+
+    def __init__(self, source, channels: int = DEFAULT_CHANNELS,
+                 sample_rate: float = DEFAULT_SAMPLE_RATE, buffer_seconds: float = 10.0,
+                 window: int = 200, zc_threshold: float = 0.0):
+        """
+        Args:
+            source: SerialEMGSource or FileEMGSource
+            channels: Number of EMG channels
+            sample_rate: Samples per second
+            buffer_seconds: Seconds of baseline-removed samples kept
+            window: Samples per feature window
+            zc_threshold: Minimum step counted as a zero crossing
+        """
+        self.source = source
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sample_period = 1.0 / sample_rate
+
+        self.decoder = FrameDecoder(channels)
+        self.buffer = RingBuffer(int(buffer_seconds * sample_rate), channels)
+        self.features = EMGFeatures(channels, window, zc_threshold)
+        self.window = window
+        self.zc_threshold = zc_threshold
+
+        self.running = False
+        self.finished = False
+        self.thread = None
+        self.last_sample_time = None
+        self.blocks = 0
+
+    def start(self) -> 'EMGIngest':
+        """Start the ingestion thread"""
+        self.running = True
+        self.thread = threading.Thread(target=self._ingest_loop, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop ingestion and close the source"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+        self.source.close()
+
+    def _ingest_loop(self):
+        """Background thread: read bytes, decode blocks, update buffer and features"""
+        while self.running:
+            data = self.source.read()
+            if not data:
+                if isinstance(self.source, FileEMGSource):
+                    self.finished = True
+                    break
+                continue
+
+            block = self.decoder.feed(data)
+            if len(block) == 0:
+                continue
+            now = time.perf_counter()
+
+            # The last sample arrived now; earlier ones are one period apart,
+            # unless that would overlap the previous block
+            times = now - self.sample_period * np.arange(len(block) - 1, -1, -1)
+            if self.last_sample_time is not None and times[0] <= self.last_sample_time:
+                times = self.last_sample_time + self.sample_period * np.arange(1, len(block) + 1)
+            self.last_sample_time = times[-1]
+
+            cleaned = self.features.update(block.astype(np.float32), times)
+            self.buffer.write(cleaned, times)
+            self.blocks += 1
+
+        self.running = False
+
+    def latest_features(self) -> Dict[str, np.ndarray]:
+        """Features for the newest window"""
+        return self.features.latest()
+
+    def features_at(self, t: float) -> Dict[str, np.ndarray]:
+        """
+        Features for the window ending at time t
+        Args:
+            t: perf_counter time, e.g. a camera frame's capture time
+        """
+        _, samples = self.buffer.window_before(t, self.window + 1)
+        previous = None
+        if len(samples) > self.window:
+            previous, samples = samples[0], samples[1:]
+        return compute_features(samples, self.zc_threshold, previous)
+
+    def stats(self) -> Dict[str, float]:
+        """Ingestion counters"""
+        return {
+            'samples': self.buffer.total,
+            'blocks': self.blocks,
+            'dropped_samples': self.decoder.dropped_samples,
+            'resyncs': self.decoder.resyncs,
+        }
+
+
+class FusionRecorder:
+    """Pairs vision finger angles with the EMG features at the frame's capture time"""
+
+    FEATURES = ('rms', 'mav', 'zc')
+
+    def __init__(self, ingest: EMGIngest):
+        self.ingest = ingest
+        self.times: List[float] = []
+        self.angles: List[List[float]] = []
+        self.features: List[np.ndarray] = []
+
+    def add_frame(self, capture_time: Optional[float], angles: List[float]) -> np.ndarray:
+        """
+        Record one frame
+        Args:
+            capture_time: perf_counter time the frame was captured
+            angles: Finger angles from the frame
+        Returns:
+            (3, channels) features aligned to the frame
+        """
+        t = time.perf_counter() if capture_time is None else capture_time
+        features = self.ingest.features_at(t)
+        stacked = np.stack([features[name] for name in self.FEATURES])
+
+        self.times.append(t)
+        self.angles.append(list(angles))
+        self.features.append(stacked)
+        return stacked
+
+    def save(self, path: str) -> str:
+        """
+        Save the recording as .npz
+        Returns:
+            The path written
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path,
+            times=np.array(self.times),
+            angles=np.array(self.angles, dtype=np.float32).reshape(-1, 5),
+            features=np.array(self.features, dtype=np.float32).reshape(
+                -1, len(self.FEATURES), self.ingest.channels),
+            feature_names=np.array(self.FEATURES),
+        )
+        return path
+
+
+def open_emg(source: str, channels: int = DEFAULT_CHANNELS,
+             sample_rate: float = DEFAULT_SAMPLE_RATE, **kwargs) -> EMGIngest:
+    """
+    Create an ingestion pipeline for a serial port or a recording
+    Args:
+        source: Serial port name, or path to a .bin/.npy recording
+        channels: Number of EMG channels
+        sample_rate: Samples per second
+    Returns:
+        EMGIngest, not yet started
+    """
+    if source.endswith(('.bin', '.npy')) and os.path.exists(source):
+        reader = FileEMGSource(source, channels, sample_rate)
+    else:
+        reader = SerialEMGSource(source)
+    return EMGIngest(reader, channels, sample_rate, **kwargs)
@@ -23,11 +23,24 @@ import math
 from collections import deque
 import sys
 
+from capture import open_capture
+from transport import DEFAULT_UDP_PORT, UDPTransport
+from calibration import CalibrationProfile, CalibrationSession, load_profile, save_profile
+from inference import create_backend
+
 # Configuration
 SERIAL_PORT = '/dev/ttyUSB0'  # Change to 'COM3' on Windows
 SERIAL_BAUDRATE = 115200
 SEND_INTERVAL = 0.15  # Send data every 150ms
 SMOOTHING_WINDOW = 5  # Moving average window size
+CALIBRATION_PROFILE = 'esp32'  # Saved calibration profile name
+ROBOT_HOST = None  # Set to the ESP32-CAM's IP address to send over Wi-Fi (UDP)
+ROBOT_UDP_PORT = DEFAULT_UDP_PORT
+CAMERA_SOURCE = 0  # Camera index, video path, or stream URL (http://<ip>:81/stream)
+CAMERA_FPS = 30
+CAMERA_PIXEL_FORMAT = 'MJPG'  # 'MJPG' or 'YUYV'
+INFERENCE_BACKEND = 'legacy'  # 'legacy', 'tasks' (async LIVE_STREAM) or 'onnx'
+INFERENCE_MODEL = None  # hand_landmarker.task or .onnx file for the tasks/onnx backends
 
 # MediaPipe configuration
 mp_hands = mp.solutions.hands
@@ -63,17 +76,23 @@ class HandTracker:
     """Real-time hand tracking and finger angle calculation"""
     
     def __init__(self, serial_port=SERIAL_PORT, baudrate=SERIAL_BAUDRATE):
-        # Initialize MediaPipe Hands
-        self.hands = mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
+        # Initialize the hand landmark backend
+        self.backend = create_backend(
+            INFERENCE_BACKEND, INFERENCE_MODEL,
             min_detection_confidence=0.7,
             min_tracking_confidence=0.5
         )
         
-        # Initialize serial connection
+        # Initialize serial connection, or UDP if a robot address is configured
         self.serial_connection = None
-        self.init_serial(serial_port, baudrate)
+        self.transport = None
+        if ROBOT_HOST:
+            self.transport = UDPTransport(ROBOT_HOST, ROBOT_UDP_PORT)
+            self.transport.send_interval = 0  # run() already paces sends
+            self.transport.verbose = True
+            self.transport.connect()
+        else:
+            self.init_serial(serial_port, baudrate)
         
         # Initialize angle filters for each finger
         self.angle_filters = {
@@ -97,9 +116,19 @@ class HandTracker:
             'pinky': {'min_angle': 20, 'max_angle': 160}
         }
         
+        # Use the saved profile if there is one, otherwise the defaults above.
+        # Raw joint angles are ~180 when straight, so open maps to 180.
+        self.calibration_profile = load_profile(CALIBRATION_PROFILE)
+        if self.calibration_profile:
+            print(f"Loaded calibration profile '{CALIBRATION_PROFILE}'")
+        else:
+            self.calibration_profile = CalibrationProfile.from_ranges(
+                self.calibration, open_servo=180, closed_servo=0)
+        self.calibration_session = None
+        
         print("Hand Tracker initialized!")
         print(f"Serial port: {serial_port}")
-        print("Press 'q' to quit, 'r' to reset filters")
+        print("Press 'q' to quit, 'r' to reset filters, 'k' to calibrate")
     
     def init_serial(self, port, baudrate):
         """Initialize serial connection to ESP32-CAM"""
@@ -132,8 +161,8 @@ class HandTracker:
     
     def get_finger_angle(self, landmarks, finger_name):
         """
-        Calculate bend angle for a specific finger
-        Returns angle in 0-180 range (0=curled, 180=straight)
+        Calculate raw joint angle for a specific finger
+        Returns angle in degrees before calibration (~180=straight)
         """
         finger_points = FINGER_LANDMARKS[finger_name]
         
@@ -149,36 +178,25 @@ class HandTracker:
             p2 = [landmarks[finger_points[1]].x, landmarks[finger_points[1]].y]
             p3 = [landmarks[finger_points[2]].x, landmarks[finger_points[2]].y]
         
-        # Calculate raw angle
-        raw_angle = self.calculate_angle(p1, p2, p3)
-        
-        # Apply calibration mapping
-        cal = self.calibration[finger_name]
-        
-        # Map raw angle to 0-180 range
-        # Smaller joint angles typically mean more curled fingers
-        if raw_angle < cal['min_angle']:
-            mapped_angle = 0
-        elif raw_angle > cal['max_angle']:
-            mapped_angle = 180
-        else:
-            # Linear mapping
-            mapped_angle = ((raw_angle - cal['min_angle']) / 
-                          (cal['max_angle'] - cal['min_angle'])) * 180
-        
-        return int(mapped_angle)
+        return self.calculate_angle(p1, p2, p3)
+    
+    def get_raw_angles(self, landmarks):
+        """Calculate raw joint angles for all fingers"""
+        return [self.get_finger_angle(landmarks, name) for name in FINGER_LANDMARKS]
     
-    def process_hand_landmarks(self, landmarks):
+    def process_hand_landmarks(self, landmarks, raw_angles=None):
         """Process hand landmarks and return finger angles"""
         finger_angles = []
-        finger_names = ['thumb', 'index', 'middle', 'ring', 'pinky']
         
-        for finger_name in finger_names:
-            # Calculate raw angle
-            raw_angle = self.get_finger_angle(landmarks, finger_name)
-            
+        if raw_angles is None:
+            raw_angles = self.get_raw_angles(landmarks)
+        
+        # Map all fingers to 0-180 (0=curled, 180=straight) in one pass
+        mapped_angles = self.calibration_profile.apply(raw_angles)
+        
+        for finger_name, mapped_angle in zip(FINGER_LANDMARKS, mapped_angles):
             # Apply smoothing filter
-            smoothed_angle = self.angle_filters[finger_name].update(raw_angle)
+            smoothed_angle = self.angle_filters[finger_name].update(mapped_angle)
             
             # Clamp to valid range
             smoothed_angle = max(0, min(180, int(smoothed_angle)))
@@ -186,9 +204,28 @@ class HandTracker:
         
         return finger_angles
     
+    def update_calibration(self, raw_angles):
+        """Feed raw angles to the running calibration and apply it when done"""
+        if not self.calibration_session.update(raw_angles):
+            return
+        
+        self.calibration_profile = self.calibration_session.build_profile(
+            CALIBRATION_PROFILE, open_servo=180, closed_servo=0)
+        self.calibration_session = None
+        for filter_obj in self.angle_filters.values():
+            filter_obj.reset()
+        
+        try:
+            path = save_profile(self.calibration_profile)
+            print(f"Calibration saved to {path}")
+        except OSError as e:
+            print(f"Warning: Could not save calibration: {e}")
+    
     def send_to_robot(self, angles):
-        """Send angle data to ESP32-CAM via serial"""
-        if self.serial_connection and self.serial_connection.is_open:
+        """Send angle data to ESP32-CAM via serial or UDP"""
+        if self.transport:
+            self.transport.send_angles(angles)
+        elif self.serial_connection and self.serial_connection.is_open:
             try:
                 # Format command for ESP32-CAM
                 command = f"MIMIC {','.join(map(str, angles))}\n"
@@ -227,21 +264,20 @@ class HandTracker:
     
     def run(self):
         """Main tracking loop"""
-        cap = cv2.VideoCapture(0)
+        cap = open_capture(CAMERA_SOURCE, width=640, height=480, fps=CAMERA_FPS,
+                           pixel_format=CAMERA_PIXEL_FORMAT, buffer_size=1)
         
-        if not cap.isOpened():
+        if not cap.open():
             print("Error: Could not open camera")
             return
         
-        # Set camera resolution
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        
+        print(f"Camera: {cap.describe()}")
         print("Starting hand tracking...")
         print("Controls:")
         print("  'q' - Quit")
         print("  'r' - Reset angle filters")
         print("  'c' - Toggle calibration display")
+        print("  'k' - Record a new calibration")
         
         show_calibration = False
         
@@ -250,6 +286,7 @@ class HandTracker:
             if not ret:
                 print("Error: Could not read frame")
                 break
+            capture_ms = int((cap.last_capture_time or time.perf_counter()) * 1000)
             
             # Flip frame horizontally for mirror effect
             frame = cv2.flip(frame, 1)
@@ -257,32 +294,48 @@ class HandTracker:
             # Convert BGR to RGB
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             
-            # Process frame with MediaPipe
-            results = self.hands.process(rgb_frame)
+            # Process frame (only the first hand is returned)
+            result = self.backend.process(rgb_frame, capture_ms)
             
             current_angles = self.previous_angles.copy()  # Fallback to previous
             
-            if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Calculate finger angles
-                    current_angles = self.process_hand_landmarks(hand_landmarks.landmark)
-                    
-                    # Update previous angles
-                    self.previous_angles = current_angles
-                    
-                    # Draw landmarks and info
-                    self.draw_finger_info(frame, current_angles, hand_landmarks)
-                    
-                    break  # Only process first hand
+            if not self.backend.new_result:
+                # Async backend is still working on a newer frame
+                self.draw_finger_info(frame, current_angles)
+            elif result is not None:
+                hand_landmarks = result.hand_landmarks
+                raw_angles = self.get_raw_angles(hand_landmarks.landmark)
+                if self.calibration_session:
+                    self.update_calibration(raw_angles)
+                
+                # Calculate finger angles
+                current_angles = self.process_hand_landmarks(hand_landmarks.landmark,
+                                                             raw_angles)
+                
+                # Update previous angles
+                self.previous_angles = current_angles
+                
+                # Draw landmarks and info; async results belong to an earlier frame
+                self.draw_finger_info(frame, current_angles, hand_landmarks)
+                age_ms = int(time.perf_counter() * 1000) - result.frame_timestamp_ms
+                cv2.putText(frame, f"Landmarks: {age_ms} ms old", (10, 160),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
             else:
                 # No hand detected - use previous angles
+                if self.calibration_session:
+                    self.update_calibration(None)
                 self.draw_finger_info(frame, current_angles)
                 cv2.putText(frame, "No hand detected", (10, 160),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
             
-            # Send data at regular intervals
+            if self.calibration_session:
+                cv2.putText(frame, self.calibration_session.prompt, (10, 190),
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            
+            # Send data at regular intervals (held while calibrating)
             current_time = time.time()
-            if current_time - self.last_send_time >= SEND_INTERVAL:
+            if (not self.calibration_session and
+                    current_time - self.last_send_time >= SEND_INTERVAL):
                 self.send_to_robot(current_angles)
                 self.last_send_time = current_time
             
@@ -291,8 +344,8 @@ class HandTracker:
                 y_pos = 200
                 cv2.putText(frame, "Calibration Ranges:", (10, y_pos),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                for i, (finger, cal) in enumerate(self.calibration.items()):
-                    text = f"{finger}: {cal['min_angle']}-{cal['max_angle']}"
+                for i, (finger, cal) in enumerate(self.calibration_profile.ranges().items()):
+                    text = f"{finger}: {cal['closed']:.0f}-{cal['open']:.0f}"
                     cv2.putText(frame, text, (10, y_pos + 20 + i * 20),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
             
@@ -311,16 +364,25 @@ class HandTracker:
             elif key == ord('c'):
                 show_calibration = not show_calibration
                 print(f"Calibration display: {'ON' if show_calibration else 'OFF'}")
+            elif key == ord('k'):
+                print("Calibrating: hold your hand open, then make a fist")
+                self.calibration_session = CalibrationSession(list(FINGER_LANDMARKS))
         
         # Cleanup
         cap.release()
         cv2.destroyAllWindows()
+        self.backend.close()
         if self.serial_connection and self.serial_connection.is_open:
             # Send neutral position before closing
             self.send_to_robot([90, 90, 90, 90, 90])
             time.sleep(0.5)
             self.serial_connection.close()
             print("Serial connection closed")
+        elif self.transport and self.transport.connected:
+            self.send_to_robot([90, 90, 90, 90, 90])
+            time.sleep(0.5)
+            print(f"Link stats: {self.transport.stats.summary()}")
+            self.transport.disconnect()
 
 def main():
     """Main function"""
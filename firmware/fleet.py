@@ -0,0 +1,857 @@
+"""
+asyncio runtime for driving many robot endpoints from one process.
+
+SerialCommunicator, UDPTransport and WebSocketTransport each run their own
+threads. Fleet instead runs every endpoint - serial ports, UDP and WebSocket
+devices - as tasks on a single event loop thread with non-blocking I/O, so
+adding a device adds a task, not a thread.
+
+Each endpoint has:
+- a latest-wins setpoint slot: setpoints that arrive faster than the
+  endpoint's send_interval are coalesced, never queued
+- reconnection with exponential backoff and jitter
+- per-device metrics (sent, coalesced, responses, errors, reconnects,
+  publish-to-write latency and round-trip time)
+
+The tracking loop publishes from its own thread through Fleet.publish (or
+send_angles, the same interface as SerialCommunicator), which hands the
+setpoint to the loop with a single call_soon_threadsafe.
+
+Endpoint specs (also accepted by pc_ver.py --endpoints):
+    serial:/dev/ttyUSB0          serial:COM3@115200
+    udp:192.168.4.2              udp:192.168.4.2:4210
+    ws:192.168.4.3               left=udp:192.168.4.2   (named endpoint)
+
+The bench command drives simulated devices and reports per-device metrics:
+    python fleet.py --simulate-serial 4 --simulate-udp 16 --rate 60 --duration 10
+
+Requirements:
+- numpy
+- pyserial (for serial endpoints)
+- websockets (optional, for WebSocket endpoints)
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from transport import DEFAULT_UDP_PORT, DEFAULT_WS_PORT, LinkStats, format_packet, parse_ack
+
+try:
+    import serial
+except ImportError:
+    serial = None
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+    from websockets.exceptions import WebSocketException
+except ImportError:
+    ws_connect = None
+    WebSocketException = OSError
+
+
+class EndpointMetrics:
+    """Counters and latency samples for one endpoint"""
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Number of latency samples kept for percentiles
+        """
+        self.state = 'idle'
+        self.published = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.responses = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self.write_latencies = deque(maxlen=window)
+        self.rtts = deque(maxlen=window)
+
+    def summary(self) -> Dict[str, object]:
+        """
+        Get the endpoint's metrics
+        Returns:
+            Dict of counters and latency percentiles in ms
+        """
+        result = {
+            'state': self.state,
+            'published': self.published,
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'responses': self.responses,
+            'errors': self.errors,
+            'reconnects': self.reconnects,
+            'last_error': self.last_error,
+        }
+        for key, samples in (('write', self.write_latencies), ('rtt', self.rtts)):
+            if samples:
+                values = np.array(samples) * 1000
+                result[f'{key}_p50_ms'] = float(np.percentile(values, 50))
+                result[f'{key}_p95_ms'] = float(np.percentile(values, 95))
+        return result
+
+
+class Endpoint:
+    """
+    One device driven by the Fleet event loop
+
+    Subclasses implement open(), close(), write() and receive(). receive()
+    runs for as long as the connection is up and raises when it drops.
+    """
+
+    kind = "endpoint"
+
+    # Errors that mean "reconnect", rather than a bug
+    recoverable_errors = (OSError, EOFError, asyncio.TimeoutError)
+
+    def __init__(self, name: str, send_interval: float = 0.02,
+                 backoff_initial: float = 0.5, backoff_max: float = 10.0,
+                 verbose: bool = False):
+        """
+        Args:
+            name: Name used in logs and metrics
+            send_interval: Minimum seconds between commands to this device
+            backoff_initial: First reconnect delay in seconds
+            backoff_max: Longest reconnect delay in seconds
+            verbose: Log every sent/received line
+        """
+        self.name = name
+        self.send_interval = send_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.verbose = verbose
+        self.metrics = EndpointMetrics()
+
+        self._setpoint = None  # (angles, trace, publish_time)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_write = 0.0
+
+    def offer(self, angles: List[int], trace, publish_time: float):
+        """Replace the pending setpoint (event loop thread)"""
+        if self._setpoint is not None:
+            self.metrics.coalesced += 1
+        self._setpoint = (angles, trace, publish_time)
+        self.metrics.published += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self):
+        """Connect, pump setpoints, and reconnect with backoff until cancelled"""
+        self._wakeup = asyncio.Event()
+        backoff = self.backoff_initial
+        attempts = 0
+
+        while True:
+            if attempts:
+                self.metrics.reconnects += 1
+            attempts += 1
+            self.metrics.state = 'connecting'
+
+            try:
+                await self.open()
+            except self.recoverable_errors as e:
+                self._record_error(f"connect failed: {e}")
+            else:
+                self.metrics.state = 'connected'
+                backoff = self.backoff_initial
+                if self.verbose:
+                    print(f"✅ {self.name} connected")
+                try:
+                    await self._pump()
+                except self.recoverable_errors as e:
+                    self._record_error(f"connection lost: {e}")
+                finally:
+                    await self.close()
+
+            self.metrics.state = 'backoff'
+            await asyncio.sleep(backoff * random.uniform(0.8, 1.2))
+            backoff = min(backoff * 2, self.backoff_max)
+
+    async def _pump(self):
+        """Write the newest setpoint at most every send_interval"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.ensure_future(self.receive())
+        reader.add_done_callback(lambda _: self._wakeup.set())
+
+        try:
+            while True:
+                if self._setpoint is None:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                if reader.done():
+                    reader.result()  # Raises why the connection ended
+                    raise EOFError("receiver stopped")
+                if self._setpoint is None:
+                    continue
+
+                # Newer setpoints replace this one while we wait out the interval
+                delay = self._last_write + self.send_interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                angles, trace, publish_time = self._setpoint
+                self._setpoint = None
+                await self.write(angles, trace)
+                self._last_write = loop.time()
+
+                self.metrics.sent += 1
+                self.metrics.write_latencies.append(time.perf_counter() - publish_time)
+                if trace is not None:
+                    trace.mark('write')
+                if self.verbose:
+                    print(f"📤 {self.name}: {angles}")
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except (asyncio.CancelledError, *self.recoverable_errors):
+                pass
+
+    def _record_error(self, message: str):
+        self.metrics.errors += 1
+        self.metrics.last_error = message
+        if self.verbose:
+            print(f"⚠️ {self.name}: {message}")
+
+    def summary(self) -> Dict[str, object]:
+        """Per-device metrics"""
+        return self.metrics.summary()
+
+    async def open(self):
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def write(self, angles: List[int], trace):
+        raise NotImplementedError
+
+    async def receive(self):
+        raise NotImplementedError
+
+
+class SerialEndpoint(Endpoint):
+    """
+    Serial port speaking the plain "MIMIC a,b,c,d,e" protocol
+
+    On POSIX the port's file descriptor is registered with the event loop, so
+    reads and writes never block. Elsewhere (Windows) the port is polled from
+    the loop with zero timeouts.
+    """
+
+    kind = "serial"
+
+    def __init__(self, port: str, baudrate: int = 115200, name: Optional[str] = None,
+                 poll_interval: float = 0.005, **kwargs):
+        """
+        Args:
+            port: Serial port name (e.g., 'COM3' or '/dev/ttyUSB0')
+            baudrate: Communication speed
+            name: Endpoint name (defaults to the port)
+            poll_interval: Read polling period when the port has no file descriptor
+            **kwargs: Endpoint options
+        """
+        if serial is None:
+            raise RuntimeError("Serial endpoints need the 'pyserial' package")
+        super().__init__(name or port, **kwargs)
+        self.port = port
+        self.baudrate = baudrate
+        self.poll_interval = poll_interval
+        self.conn = None
+        self._fd = None
+        self._buffer = bytearray()
+        self._pending = deque(maxlen=32)  # (command, write time, trace) awaiting an echo
+
+    async def open(self):
+        # timeout=0 makes every pyserial call non-blocking
+        self.conn = serial.Serial(self.port, self.baudrate, timeout=0, write_timeout=0)
+        self._buffer.clear()
+        self._pending.clear()
+
+        loop = asyncio.get_running_loop()
+        self._fd = None
+        if hasattr(self.conn, 'fileno') and hasattr(loop, 'add_reader'):
+            try:
+                self._fd = self.conn.fileno()
+                os.set_blocking(self._fd, False)
+            except (AttributeError, NotImplementedError, OSError):
+                self._fd = None
+
+    async def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    async def write(self, angles: List[int], trace):
+        command = f"MIMIC {','.join(map(str, angles))}"
+        data = f"{command}\n".encode()
+
+        if self._fd is None:
+            self.conn.write(data)
+        else:
+            view = memoryview(data)
+            while view:
+                try:
+                    view = view[os.write(self._fd, view):]
+                except BlockingIOError:
+                    await self._writable()
+
+        self._pending.append((command, time.perf_counter(), trace))
+
+    async def _writable(self):
+        """Wait until the port accepts more bytes"""
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_writer(self._fd, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_writer(self._fd)
+
+    async def receive(self):
+        if self._fd is None:
+            while True:
+                waiting = self.conn.in_waiting
+                if waiting:
+                    self._feed(self.conn.read(waiting))
+                else:
+                    await asyncio.sleep(self.poll_interval)
+
+        loop = asyncio.get_running_loop()
+        closed = loop.create_future()
+
+        def on_readable():
+            # Read right here: readiness is only fresh inside this callback, and
+            # with VMIN=0 a read of an empty port also returns b""
+            if closed.done():
+                return
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                closed.set_exception(e)
+                return
+            if not data:
+                closed.set_exception(EOFError("port closed"))
+                return
+            self._feed(data)
+
+        loop.add_reader(self._fd, on_readable)
+        try:
+            await closed
+        finally:
+            loop.remove_reader(self._fd)
+
+    def _feed(self, data: bytes):
+        """Split received bytes into lines and match them to sent commands"""
+        self._buffer += data
+        while True:
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                break
+            line = bytes(self._buffer[:end]).strip()
+            del self._buffer[:end + 1]
+            if not line:
+                continue
+
+            self.metrics.responses += 1
+            self._match_echo(line.decode(errors='replace'))
+            if self.verbose:
+                print(f"📥 {self.name}: {line.decode(errors='replace')}")
+
+
+    def _match_echo(self, response: str):
+        """Time the command a device line echoes; unrelated lines match nothing"""
+        for i, (command, sent_time, trace) in enumerate(self._pending):
+            if response == command or response.endswith(" " + command):
+                self.metrics.rtts.append(time.perf_counter() - sent_time)
+                if trace is not None:
+                    trace.mark('echo')
+                # Answers come in order; older commands won't be echoed now
+                for _ in range(i + 1):
+                    self._pending.popleft()
+                return
+
+
+class _AckProtocol(asyncio.DatagramProtocol):
+    """Forwards datagrams from the device to a UDPEndpoint"""
+
+    def __init__(self, endpoint: 'UDPEndpoint'):
+        self.endpoint = endpoint
+
+    def datagram_received(self, data: bytes, addr):
+        self.endpoint._handle_reply(data)
+
+    def error_received(self, exc: Exception):
+        # e.g. ICMP port unreachable while the device reboots; the next
+        # datagram simply tries again
+        self.endpoint._record_error(f"UDP error: {exc}")
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.endpoint._closed.set()
+
+
+class NetworkEndpoint(Endpoint):
+    """Sequence-numbered endpoint speaking transport.py's wire format"""
+
+    def __init__(self, host: str, port: int, name: Optional[str] = None,
+                 ack_timeout: float = 1.0, **kwargs):
+        super().__init__(name or f"{self.kind}:{host}:{port}", **kwargs)
+        self.host = host
+        self.port = port
+        self.seq = 0
+        self.stats = LinkStats(ack_timeout)
+
+    def _handle_reply(self, data: bytes):
+        seq = parse_ack(data)
+        if seq is not None:
+            self.metrics.responses += 1
+            self.stats.on_ack(seq)
+        elif self.verbose:
+            print(f"📥 {self.name}: {data.decode(errors='replace').strip()}")
+
+    def _next_packet(self, angles: List[int], trace) -> bytes:
+        self.seq += 1
+        self.stats.on_send(self.seq, trace)
+        return format_packet(self.seq, angles)
+
+    def summary(self) -> Dict[str, object]:
+        result = super().summary()
+        link = self.stats.summary()
+        result.update({key: link[key] for key in ('lost', 'loss_rate', 'reordered')})
+        for key in ('rtt_p50_ms', 'rtt_p95_ms'):
+            if key in link:
+                result[key] = link[key]
+        return result
+
+
+class UDPEndpoint(NetworkEndpoint):
+    """UDP device; each setpoint is one datagram"""
+
+    kind = "udp"
+
+    def __init__(self, host: str, port: int = DEFAULT_UDP_PORT, **kwargs):
+        super().__init__(host, port, **kwargs)
+        self.datagrams = None
+        self._closed = asyncio.Event()
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self._closed = asyncio.Event()
+        self.datagrams, _ = await loop.create_datagram_endpoint(
+            lambda: _AckProtocol(self), remote_addr=(self.host, self.port))
+
+    async def close(self):
+        if self.datagrams is not None:
+            self.datagrams.close()
+            self.datagrams = None
+
+    async def write(self, angles: List[int], trace):
+        self.datagrams.sendto(self._next_packet(angles, trace))
+
+    async def receive(self):
+        # Datagrams arrive through _AckProtocol; just wait for the socket to close
+        await self._closed.wait()
+        raise EOFError("socket closed")
+
+
+class WebSocketEndpoint(NetworkEndpoint):
+    """WebSocket device; TCP_NODELAY is set so small frames go out at once"""
+
+    kind = "ws"
+    recoverable_errors = Endpoint.recoverable_errors + (WebSocketException,)
+
+    def __init__(self, host: str, port: int = DEFAULT_WS_PORT, path: str = "/", **kwargs):
+        if ws_connect is None:
+            raise RuntimeError("WebSocket endpoints need the 'websockets' package")
+        super().__init__(host, port, **kwargs)
+        self.url = f"ws://{host}:{port}{path}"
+        self.ws = None
+
+    async def open(self):
+        self.ws = await ws_connect(self.url, compression=None, open_timeout=5)
+        sock = self.ws.transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+            self.ws = None
+
+    async def write(self, angles: List[int], trace):
+        await self.ws.send(self._next_packet(angles, trace).decode())
+
+    async def receive(self):
+        async for message in self.ws:
+            self._handle_reply(message.encode() if isinstance(message, str) else message)
+        raise EOFError("connection closed")
+
+
+class Fleet:
+    """
+    Runs endpoints on one event loop thread
+
+    Has the same send_angles/connect/disconnect interface as
+    SerialCommunicator, so HandControlApp can drive every endpoint at once.
+    """
+
+    label = "Fleet"
+
+    def __init__(self, endpoints: Optional[Iterable[Endpoint]] = None):
+        """
+        Args:
+            endpoints: Initial endpoints (more can be added while running)
+        """
+        self.endpoints: Dict[str, Endpoint] = {}
+        self.connected = False
+        self.verbose = False
+        self.last_send_time = 0
+        self.send_interval = 0.0  # Endpoints rate limit themselves
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+        for endpoint in endpoints or []:
+            self.add(endpoint)
+
+    def add(self, endpoint: Endpoint):
+        """Add an endpoint, starting it immediately if the fleet is running"""
+        if endpoint.name in self.endpoints:
+            raise ValueError(f"Duplicate endpoint name '{endpoint.name}'")
+        if self.connected:
+            # The endpoint table is only changed on the loop thread while running
+            self.loop.call_soon_threadsafe(self._start_endpoint, endpoint)
+        else:
+            self.endpoints[endpoint.name] = endpoint
+
+    def remove(self, name: str):
+        """Stop and remove an endpoint"""
+        if self.connected:
+            asyncio.run_coroutine_threadsafe(self._remove(name), self.loop).result(5)
+        else:
+            del self.endpoints[name]
+
+    def connect(self) -> bool:
+        """
+        Start the event loop thread and every endpoint
+        Returns:
+            True once the loop is running
+        """
+        if self.connected:
+            return True
+
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self.loop)
+            self.loop.call_soon(started.set)
+            self.loop.run_forever()
+
+        self._thread = threading.Thread(target=run_loop, name="fleet", daemon=True)
+        self._thread.start()
+        started.wait()
+
+        self.connected = True
+        for endpoint in self.endpoints.values():
+            self.loop.call_soon_threadsafe(self._start_endpoint, endpoint)
+        print(f"✅ Fleet running {len(self.endpoints)} endpoints on one event loop")
+        return True
+
+    def disconnect(self, timeout: float = 5.0):
+        """Stop every endpoint, close its connection, and stop the loop"""
+        if not self.connected:
+            return
+        self.connected = False
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+        except Exception as e:
+            print(f"⚠️ Fleet shutdown: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop.close()
+        print(f"🔌 Fleet stopped ({len(self.endpoints)} endpoints)")
+        for name, endpoint in self.endpoints.items():
+            m = endpoint.metrics
+            print(f"   {name}: {m.sent} sent, {m.coalesced} coalesced, {m.responses} answers, "
+                  f"{m.errors} errors, {m.reconnects} reconnects")
+
+    def publish(self, angles: List[int], trace=None,
+                targets: Optional[Iterable[str]] = None) -> bool:
+        """
+        Hand a setpoint to the endpoints (safe to call from any thread)
+        Args:
+            angles: List of 5 finger angles (0-180°)
+            trace: Optional latency trace, marked by whichever endpoint writes last
+            targets: Endpoint names (default: all)
+        Returns:
+            True if the fleet is running
+        """
+        if not self.connected:
+            return False
+        targets = tuple(targets) if targets is not None else None
+        self.loop.call_soon_threadsafe(self._deliver, list(angles), trace, targets,
+                                       time.perf_counter())
+        return True
+
+    def send_angles(self, angles: List[int], trace=None) -> bool:
+        """
+        Send finger angles to every endpoint
+        Args:
+            angles: List of 5 finger angles (0-180°)
+            trace: Optional latency trace stamped as the command moves along
+        Returns:
+            True if the setpoint was published
+        """
+        current_time = time.time()
+
+        # Rate limiting
+        if current_time - self.last_send_time < self.send_interval:
+            return False
+        self.last_send_time = current_time
+
+        if trace is not None:
+            trace.mark('queued')
+
+        if not self.connected:
+            print(f"🤖 Would send: MIMIC {','.join(map(str, angles))}")
+            return True
+        return self.publish(angles, trace)
+
+    def metrics(self) -> Dict[str, Dict[str, object]]:
+        """
+        Get per-endpoint metrics
+        Returns:
+            Dict of endpoint name -> metrics
+        """
+        if not self.connected:
+            return {name: ep.summary() for name, ep in self.endpoints.items()}
+        future = asyncio.run_coroutine_threadsafe(self._collect(), self.loop)
+        return future.result(5)
+
+    def _deliver(self, angles: List[int], trace, targets, publish_time: float):
+        """Fan a setpoint out to the endpoints (event loop thread)"""
+        names = targets if targets is not None else self.endpoints
+        for name in names:
+            endpoint = self.endpoints.get(name)
+            if endpoint is not None:
+                endpoint.offer(angles, trace, publish_time)
+
+    def _start_endpoint(self, endpoint: Endpoint):
+        self.endpoints[endpoint.name] = endpoint
+        self._tasks[endpoint.name] = self.loop.create_task(endpoint.run())
+
+    async def _remove(self, name: str):
+        await self._stop_endpoint(self.endpoints.pop(name))
+
+    async def _stop_endpoint(self, endpoint: Endpoint):
+        task = self._tasks.pop(endpoint.name, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        endpoint.metrics.state = 'stopped'
+
+    async def _shutdown(self):
+        await asyncio.gather(*(self._stop_endpoint(ep) for ep in self.endpoints.values()))
+
+    async def _collect(self) -> Dict[str, Dict[str, object]]:
+        return {name: ep.summary() for name, ep in self.endpoints.items()}
+
+
+def parse_endpoint(spec: str, **kwargs) -> Endpoint:
+    """
+    Create an endpoint from a spec string
+    Args:
+        spec: '[name=]serial:PORT[@BAUD]', '[name=]udp:HOST[:PORT]' or '[name=]ws:HOST[:PORT]'
+        **kwargs: Endpoint options (send_interval, backoff, ...)
+    Returns:
+        The endpoint
+    """
+    name = None
+    if '=' in spec.split(':', 1)[0]:
+        name, spec = spec.split('=', 1)
+    kind, _, address = spec.partition(':')
+    if not address:
+        raise ValueError(f"Endpoint spec '{spec}' needs an address")
+
+    if kind == 'serial':
+        port, _, baud = address.partition('@')
+        return SerialEndpoint(port, int(baud) if baud else 115200, name=name, **kwargs)
+
+    host, _, port = address.rpartition(':') if address.count(':') == 1 else (address, '', '')
+    if kind == 'udp':
+        return UDPEndpoint(host, int(port) if port else DEFAULT_UDP_PORT, name=name, **kwargs)
+    if kind == 'ws':
+        return WebSocketEndpoint(host, int(port) if port else DEFAULT_WS_PORT, name=name, **kwargs)
+    raise ValueError(f"Unknown endpoint type '{kind}' (use serial, udp or ws)")
+
+
+class SimulatedSerialDevices:
+    """
+    Pseudo-terminal stand-ins for serial boards
+
+    Each device is a pty whose far end answers every line with "OK <line>".
+    All devices share one selector thread.
+    """
+
+    def __init__(self, count: int):
+        import pty
+
+        self.masters: List[int] = []
+        self.paths: List[str] = []
+        self._slaves: List[int] = []
+        for _ in range(count):
+            master, slave = pty.openpty()
+            os.set_blocking(master, False)
+            self.masters.append(master)
+            self._slaves.append(slave)  # Held open so the pty survives reconnects
+            self.paths.append(os.ttyname(slave))
+
+        self.received = 0
+        self.running = False
+        self._buffers = {fd: bytearray() for fd in self.masters}
+        self._thread = None
+
+    def start(self) -> 'SimulatedSerialDevices':
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self._thread.join(timeout=1)
+        for fd in self.masters + self._slaves:
+            os.close(fd)
+
+    def _loop(self):
+        selector = selectors.DefaultSelector()
+        for fd in self.masters:
+            selector.register(fd, selectors.EVENT_READ)
+
+        while self.running:
+            for key, _ in selector.select(timeout=0.05):
+                fd = key.fd
+                try:
+                    self._buffers[fd] += os.read(fd, 4096)
+                except (BlockingIOError, OSError):
+                    continue
+                buffer = self._buffers[fd]
+                while b"\n" in buffer:
+                    line, _, rest = bytes(buffer).partition(b"\n")
+                    buffer[:] = rest
+                    self.received += 1
+                    try:
+                        os.write(fd, b"OK " + line.strip() + b"\n")
+                    except OSError:
+                        pass
+        selector.close()
+
+
+def main():
+    """Drive simulated or real endpoints at a fixed publish rate and report metrics"""
+    parser = argparse.ArgumentParser(description="Drive many robot endpoints from one event loop")
+    parser.add_argument("--endpoints", nargs='*', default=[],
+                        help="Endpoint specs, e.g. serial:/dev/ttyUSB0 udp:192.168.4.2")
+    parser.add_argument("--simulate-serial", type=int, default=0,
+                        help="Number of simulated pty serial devices")
+    parser.add_argument("--simulate-udp", type=int, default=0,
+                        help="Number of simulated UDP devices")
+    parser.add_argument("--rate", type=float, default=60, help="Setpoints published per second")
+    parser.add_argument("--send-interval", type=float, default=0.02,
+                        help="Minimum seconds between commands per endpoint")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds to run")
+    args = parser.parse_args()
+
+    # Imported here so the runtime doesn't depend on the loopback devices
+    from transport import LoopbackUDPDevice
+
+    serial_devices = SimulatedSerialDevices(args.simulate_serial).start() \
+        if args.simulate_serial else None
+    udp_devices = [LoopbackUDPDevice().start() for _ in range(args.simulate_udp)]
+
+    endpoints = [parse_endpoint(spec, send_interval=args.send_interval)
+                 for spec in args.endpoints]
+    if serial_devices:
+        endpoints += [SerialEndpoint(path, name=f"sim-serial{i}", send_interval=args.send_interval)
+                      for i, path in enumerate(serial_devices.paths)]
+    endpoints += [UDPEndpoint(*device.address, name=f"sim-udp{i}",
+                              send_interval=args.send_interval)
+                  for i, device in enumerate(udp_devices)]
+    if not endpoints:
+        parser.error("give --endpoints or --simulate-serial/--simulate-udp")
+
+    fleet = Fleet(endpoints)
+    threads_before = threading.active_count()
+    fleet.connect()
+    threads_added = threading.active_count() - threads_before
+
+    # Publish from this thread, as the tracking loop would
+    period = 1.0 / args.rate
+    published = 0
+    publish_times = []
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    next_time = wall_start
+
+    try:
+        while time.perf_counter() - wall_start < args.duration:
+            phase = published * period
+            angles = [int(90 + 80 * np.sin(phase + finger)) for finger in range(5)]
+            start = time.perf_counter()
+            fleet.publish(angles)
+            publish_times.append(time.perf_counter() - start)
+            published += 1
+
+            next_time += period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+
+    time.sleep(0.2)  # Let the last answers come back
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    metrics = fleet.metrics()
+    fleet.disconnect()
+
+    if serial_devices:
+        serial_devices.stop()
+    for device in udp_devices:
+        device.stop()
+
+    publish_us = np.array(publish_times) * 1e6
+    print(f"\n📊 {len(endpoints)} endpoints, {published} setpoints at {args.rate:g}/s, "
+          f"{threads_added} thread(s) added by the fleet")
+    print(f"   publish call p50 {np.percentile(publish_us, 50):.1f}µs "
+          f"p99 {np.percentile(publish_us, 99):.1f}µs, "
+          f"CPU {100 * cpu / wall:.1f}% of one core (incl. simulated devices)")
+    print(f"\n  {'endpoint':<16}{'state':<11}{'sent':>7}{'coalesced':>10}{'answers':>8}"
+          f"{'errors':>7}{'reconn':>7}{'write p95':>10}{'rtt p50':>9}{'rtt p95':>9}  (ms)")
+    for name, m in metrics.items():
+        print(f"  {name:<16}{m['state']:<11}{m['sent']:>7}{m['coalesced']:>10}"
+              f"{m['responses']:>8}{m['errors']:>7}{m['reconnects']:>7}"
+              f"{m.get('write_p95_ms', float('nan')):>10.2f}"
+              f"{m.get('rtt_p50_ms', float('nan')):>9.2f}"
+              f"{m.get('rtt_p95_ms', float('nan')):>9.2f}")
+        if m['last_error']:
+            print(f"    last error: {m['last_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Pluggable hand-landmark inference backends.
+
+HandTracker talks to an InferenceBackend instead of calling
+mp.solutions.hands directly. Every backend takes an RGB frame and a
+millisecond timestamp and returns each answer once: a HandResult, or None
+when no hand was found. Asynchronous backends set new_result to False when
+no answer has arrived since the last call, so callers can tell "still
+working" from "no hand". A result's frame_timestamp_ms is the timestamp
+passed with the frame it belongs to, which may be an earlier frame:
+
+- LegacyHandsBackend: the synchronous mp.solutions.hands.Hands solution
+- TasksLiveStreamBackend: MediaPipe Tasks HandLandmarker in LIVE_STREAM mode.
+  detect_async() returns immediately and results arrive on a callback, so
+  the main loop never waits for inference; each result carries the
+  timestamp of the frame it belongs to.
+- ONNXBackend: a hand landmark model converted to ONNX, run on the ONNX
+  Runtime CPU provider. It has no palm detector, so it crops around the
+  previous frame's hand (or the centre of the frame) before inference.
+
+The module CLI compares the backends on the same recorded clip:
+    python inference.py clip.mp4 --backends legacy tasks onnx \\
+        --task-model hand_landmarker.task --onnx-model hand_landmark.onnx
+
+Requirements:
+- opencv-python
+- mediapipe
+- numpy
+- onnxruntime (optional, for the ONNX backend)
+"""
+
+import argparse
+import threading
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+NUM_LANDMARKS = 21
+
+
+class HandResult:
+    """Landmarks of one detected hand"""
+
+    def __init__(self, landmarks: np.ndarray, frame_timestamp_ms: int,
+                 score: float = 1.0, proto=None):
+        """
+        Args:
+            landmarks: (21, 3) normalized x, y and relative z
+            frame_timestamp_ms: Timestamp of the frame the result belongs to
+            score: Hand presence confidence
+            proto: Existing NormalizedLandmarkList, if the backend has one
+        """
+        self.landmarks = landmarks
+        self.frame_timestamp_ms = frame_timestamp_ms
+        self.score = score
+        self._proto = proto
+
+    @property
+    def hand_landmarks(self):
+        """
+        Landmarks as a MediaPipe NormalizedLandmarkList, as used by
+        HandTracker.get_finger_angles and mp_drawing.draw_landmarks
+        """
+        if self._proto is None:
+            from mediapipe.framework.formats import landmark_pb2
+
+            self._proto = landmark_pb2.NormalizedLandmarkList(landmark=[
+                landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z))
+                for x, y, z in self.landmarks
+            ])
+        return self._proto
+
+
+class InferenceBackend:
+    """Base class: process() returns each new HandResult once, or None"""
+
+    name = "base"
+
+    # False after a process() call that had no new answer to return
+    new_result = True
+
+    def process(self, rgb_frame: np.ndarray, timestamp_ms: int) -> Optional[HandResult]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LegacyHandsBackend(InferenceBackend):
+    """Synchronous mp.solutions.hands.Hands"""
+
+    name = "legacy"
+
+    def __init__(self, min_detection_confidence: float = 0.7,
+                 min_tracking_confidence: float = 0.5, static_image_mode: bool = False):
+        import mediapipe as mp
+
+        self.hands = mp.solutions.hands.Hands(
+            static_image_mode=static_image_mode,
+            max_num_hands=1,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def process(self, rgb_frame: np.ndarray, timestamp_ms: int) -> Optional[HandResult]:
+        results = self.hands.process(rgb_frame)
+        if not results.multi_hand_landmarks:
+            return None
+
+        # Only the first detected hand is used
+        hand = results.multi_hand_landmarks[0]
+        landmarks = np.array([(p.x, p.y, p.z) for p in hand.landmark], dtype=np.float32)
+        score = 1.0
+        if results.multi_handedness:
+            score = results.multi_handedness[0].classification[0].score
+        return HandResult(landmarks, timestamp_ms, score, proto=hand)
+
+    def close(self):
+        self.hands.close()
+
+
+class TasksLiveStreamBackend(InferenceBackend):
+    """MediaPipe Tasks HandLandmarker in asynchronous LIVE_STREAM mode"""
+
+    name = "tasks"
+
+    def __init__(self, model_path: str = "hand_landmarker.task",
+                 min_detection_confidence: float = 0.7,
+                 min_tracking_confidence: float = 0.5):
+        """
+        Args:
+            model_path: Path to hand_landmarker.task
+            min_detection_confidence: Minimum palm detection confidence
+            min_tracking_confidence: Minimum tracking confidence
+        """
+        import mediapipe as mp
+        from mediapipe.tasks import python as mp_tasks
+        from mediapipe.tasks.python import vision
+
+        self.mp = mp
+        self.lock = threading.Lock()
+        self.latest: Optional[HandResult] = None
+        self.latest_timestamp_ms = -1
+        self.has_latest = False  # latest hasn't been returned yet
+        self.last_submitted_ms = -1
+        self.submitted = 0
+        self.completed = 0
+
+        # Called on MediaPipe's thread once a frame has been processed
+        self.on_result = None
+
+        options = vision.HandLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            num_hands=1,
+            min_hand_detection_confidence=min_detection_confidence,
+            min_hand_presence_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            result_callback=self._callback,
+        )
+        self.landmarker = vision.HandLandmarker.create_from_options(options)
+
+    def _callback(self, result, output_image, timestamp_ms: int):
+        """Store the newest result (MediaPipe thread)"""
+        hand = None
+        if result.hand_landmarks:
+            points = result.hand_landmarks[0]
+            landmarks = np.array([(p.x, p.y, p.z) for p in points], dtype=np.float32)
+            score = result.handedness[0][0].score if result.handedness else 1.0
+            hand = HandResult(landmarks, timestamp_ms, score)
+
+        with self.lock:
+            self.completed += 1
+            if timestamp_ms > self.latest_timestamp_ms:
+                self.latest = hand
+                self.latest_timestamp_ms = timestamp_ms
+                self.has_latest = True
+
+        if self.on_result is not None:
+            self.on_result(timestamp_ms, hand)
+
+    def process(self, rgb_frame: np.ndarray, timestamp_ms: int) -> Optional[HandResult]:
+        # LIVE_STREAM needs strictly increasing timestamps
+        if timestamp_ms <= self.last_submitted_ms:
+            timestamp_ms = self.last_submitted_ms + 1
+        self.last_submitted_ms = timestamp_ms
+
+        image = self.mp.Image(image_format=self.mp.ImageFormat.SRGB,
+                              data=np.ascontiguousarray(rgb_frame))
+        self.landmarker.detect_async(image, timestamp_ms)
+        self.submitted += 1
+
+        # Hand over the newest answer once; later calls wait for a newer one
+        with self.lock:
+            self.new_result = self.has_latest
+            self.has_latest = False
+            return self.latest if self.new_result else None
+
+    def close(self):
+        self.landmarker.close()
+
+
+class ONNXBackend(InferenceBackend):
+    """
+    Hand landmark model on ONNX Runtime's CPU provider
+
+    Expects a model converted from MediaPipe's hand landmark network: one
+    square RGB input in [0, 1] (NHWC or NCHW), an output with 63 values
+    (21 x, y, z in input pixels) and an output with one hand presence score.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = "hand_landmark.onnx",
+                 min_detection_confidence: float = 0.7, min_tracking_confidence: float = 0.5,
+                 num_threads: Optional[int] = None, roi_scale: float = 1.6):
+        """
+        Args:
+            model_path: Path to the ONNX model
+            min_detection_confidence: Presence score needed to report a hand
+            min_tracking_confidence: Presence score needed to keep the crop on the hand
+            num_threads: Intra-op threads (None = ONNX Runtime default)
+            roi_scale: Crop size relative to the previous hand's bounding box
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options,
+                                            providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        shape = model_input.shape
+        self.channels_first = shape[1] == 3
+        self.input_size = int(shape[2] if self.channels_first else shape[1])
+
+        self.landmarks_output = None
+        self.score_output = None
+        for output in self.session.get_outputs():
+            size = int(np.prod([d for d in output.shape if isinstance(d, int)]))
+            if size == NUM_LANDMARKS * 3 and self.landmarks_output is None:
+                self.landmarks_output = output.name
+            elif size == 1 and self.score_output is None:
+                self.score_output = output.name
+        if self.landmarks_output is None:
+            raise ValueError(f"{model_path} has no output with {NUM_LANDMARKS * 3} values")
+
+        self.min_detection_confidence = min_detection_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self.roi_scale = roi_scale
+        self.roi = None  # (x0, y0, size) in pixels
+
+    def _default_roi(self, width: int, height: int):
+        size = min(width, height)
+        return ((width - size) // 2, (height - size) // 2, size)
+
+    def process(self, rgb_frame: np.ndarray, timestamp_ms: int) -> Optional[HandResult]:
+        height, width = rgb_frame.shape[:2]
+        x0, y0, size = self.roi or self._default_roi(width, height)
+
+        # Crop with zero padding where the square leaves the frame
+        crop = np.zeros((size, size, 3), dtype=np.uint8)
+        sx0, sy0 = max(x0, 0), max(y0, 0)
+        sx1, sy1 = min(x0 + size, width), min(y0 + size, height)
+        if sx1 > sx0 and sy1 > sy0:
+            crop[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = rgb_frame[sy0:sy1, sx0:sx1]
+
+        tensor = cv2.resize(crop, (self.input_size, self.input_size)).astype(np.float32)
+        tensor *= 1.0 / 255.0
+        if self.channels_first:
+            tensor = tensor.transpose(2, 0, 1)
+        tensor = tensor[np.newaxis]
+
+        outputs = [self.landmarks_output] + ([self.score_output] if self.score_output else [])
+        values = self.session.run(outputs, {self.input_name: tensor})
+        points = values[0].reshape(NUM_LANDMARKS, 3)
+        score = float(values[1].reshape(-1)[0]) if len(values) > 1 else 1.0
+        if score < 0 or score > 1:
+            score = float(1 / (1 + np.exp(-score)))  # Model outputs a logit
+
+        if score < self.min_tracking_confidence:
+            self.roi = None
+            return None
+
+        # Back to normalized frame coordinates
+        scale = size / self.input_size
+        landmarks = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+        landmarks[:, 0] = (points[:, 0] * scale + x0) / width
+        landmarks[:, 1] = (points[:, 1] * scale + y0) / height
+        landmarks[:, 2] = points[:, 2] * scale / width
+
+        # Next frame: crop around this hand
+        px, py = landmarks[:, 0] * width, landmarks[:, 1] * height
+        box = max(px.max() - px.min(), py.max() - py.min()) * self.roi_scale
+        box = int(max(box, self.input_size / 2))
+        cx, cy = (px.max() + px.min()) / 2, (py.max() + py.min()) / 2
+        self.roi = (int(cx - box / 2), int(cy - box / 2), box)
+
+        if score < self.min_detection_confidence:
+            return None
+        return HandResult(landmarks, timestamp_ms, score)
+
+
+BACKENDS = {
+    'legacy': LegacyHandsBackend,
+    'tasks': TasksLiveStreamBackend,
+    'onnx': ONNXBackend,
+}
+
+
+def create_backend(name: str = 'legacy', model_path: Optional[str] = None,
+                   **kwargs) -> InferenceBackend:
+    """
+    Create an inference backend by name
+    Args:
+        name: 'legacy', 'tasks' or 'onnx'
+        model_path: Model file for the tasks/onnx backends
+        **kwargs: Confidence thresholds and backend options
+    Returns:
+        The backend
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', choose from {list(BACKENDS)}")
+    if name != 'legacy' and model_path:
+        kwargs['model_path'] = model_path
+    return BACKENDS[name](**kwargs)
+
+
+def load_clip(path: str, max_frames: int) -> List[np.ndarray]:
+    """Decode a clip into RGB frames so decoding isn't part of the measurement"""
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def benchmark_backend(backend: InferenceBackend, frames: List[np.ndarray],
+                      fps: float = 30.0, paced: bool = False) -> Dict[str, float]:
+    """
+    Run a backend over frames and measure it
+    Args:
+        backend: Backend to measure
+        frames: RGB frames
+        fps: Clip frame rate, used for timestamps and pacing
+        paced: Feed frames at the clip's frame rate instead of as fast as possible
+    Returns:
+        Dict of throughput, call latency, result latency, detection rate,
+        dropped frames and CPU use
+    """
+    submit_times: Dict[int, float] = {}
+    result_latencies: List[float] = []
+    detections = [0]
+    is_async = isinstance(backend, TasksLiveStreamBackend)
+    # Wall and CPU clocks at the newest result, so waiting for stragglers isn't counted
+    last_result = [0.0, 0.0]
+
+    # For the async backend, time from submit to the result callback
+    if is_async:
+        def on_result(timestamp_ms, hand):
+            now = time.perf_counter()
+            last_result[:] = [now, time.process_time()]
+            sent = submit_times.get(timestamp_ms)
+            if sent is not None:
+                result_latencies.append(now - sent)
+            detections[0] += hand is not None
+        backend.on_result = on_result
+
+    call_times = []
+    frame_interval = 1.0 / fps
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    for i, frame in enumerate(frames):
+        if paced:
+            delay = wall_start + i * frame_interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        timestamp_ms = int(i * frame_interval * 1000)
+        start = time.perf_counter()
+        submit_times[timestamp_ms] = start
+        result = backend.process(frame, timestamp_ms)
+        end = time.perf_counter()
+        call_times.append(end - start)
+
+        if not is_async:
+            result_latencies.append(end - start)
+            detections[0] += result is not None
+
+    wall_end, cpu_end = time.perf_counter(), time.process_time()
+
+    # LIVE_STREAM skips frames sent while it is busy and never answers them,
+    # so wait only until results stop arriving for about one inference
+    if is_async:
+        deadline = time.perf_counter() + 2.0
+        while backend.completed < backend.submitted and time.perf_counter() < deadline:
+            idle = 2 * float(np.mean(result_latencies)) if result_latencies else 0.5
+            if time.perf_counter() - max(last_result[0], wall_end) > idle:
+                break
+            time.sleep(0.005)
+        if last_result[0] > wall_end:
+            wall_end, cpu_end = last_result
+
+    wall = wall_end - wall_start
+    cpu = cpu_end - cpu_start
+    calls = np.array(call_times) * 1000
+    latencies = np.array(result_latencies) * 1000
+    results = len(result_latencies)
+
+    summary = {
+        'frames': len(frames),
+        'results': results,
+        'dropped': backend.submitted - backend.completed if is_async else 0,
+        'throughput_fps': results / wall if wall > 0 else 0.0,
+        'call_mean_ms': float(calls.mean()),
+        'call_p95_ms': float(np.percentile(calls, 95)),
+        'detection_rate': detections[0] / results if results else 0.0,
+        'cpu_cores': cpu / wall if wall > 0 else 0.0,
+    }
+    if len(latencies):
+        summary['result_p50_ms'] = float(np.percentile(latencies, 50))
+        summary['result_p95_ms'] = float(np.percentile(latencies, 95))
+    return summary
+
+
+def main():
+    """Compare inference backends on the same clip"""
+    parser = argparse.ArgumentParser(description="Benchmark hand landmark inference backends")
+    parser.add_argument("clip", help="Recorded video")
+    parser.add_argument("--backends", nargs='+', choices=list(BACKENDS), default=['legacy'])
+    parser.add_argument("--task-model", default="hand_landmarker.task",
+                        help="MediaPipe Tasks model for the tasks backend")
+    parser.add_argument("--onnx-model", default="hand_landmark.onnx",
+                        help="ONNX landmark model for the onnx backend")
+    parser.add_argument("--frames", type=int, default=300, help="Maximum frames to use")
+    parser.add_argument("--fps", type=float, default=30, help="Clip frame rate for timestamps")
+    parser.add_argument("--paced", action="store_true",
+                        help="Feed frames in real time instead of as fast as possible")
+    args = parser.parse_args()
+
+    frames = load_clip(args.clip, args.frames)
+    if not frames:
+        print(f"❌ No frames read from {args.clip}")
+        return
+    print(f"🎞️ {len(frames)} frames from {args.clip}")
+
+    models = {'tasks': args.task_model, 'onnx': args.onnx_model}
+    results = {}
+    for name in args.backends:
+        try:
+            backend = create_backend(name, models.get(name))
+        except (ImportError, OSError, RuntimeError, ValueError) as e:
+            print(f"⚠️ Skipping {name}: {e}")
+            continue
+        try:
+            # One untimed pass over a few frames loads and warms up the model
+            benchmark_backend(backend, frames[:5], args.fps)
+            if isinstance(backend, TasksLiveStreamBackend):
+                backend.close()
+                backend = create_backend(name, models.get(name))
+            results[name] = benchmark_backend(backend, frames, args.fps, args.paced)
+        finally:
+            backend.close()
+
+    columns = ['results', 'dropped', 'throughput_fps', 'call_mean_ms', 'call_p95_ms',
+               'result_p50_ms', 'result_p95_ms', 'detection_rate', 'cpu_cores']
+    print(f"\n  {'backend':<10}" + "".join(f"{c:>16}" for c in columns))
+    for name, summary in results.items():
+        cells = []
+        for c in columns:
+            value = summary.get(c)
+            if value is None:
+                cells.append(f"{'-':>16}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>16.2f}")
+            else:
+                cells.append(f"{value:>16}")
+        print(f"  {name:<10}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()
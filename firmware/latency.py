@@ -0,0 +1,234 @@
+"""
+Glass-to-servo latency measurement for the hand tracking pipeline.
+
+Each captured frame gets a LatencyTrace (tracing.py) stamped at capture, after
+HandTracker.process_frame, after the angle filter, when send_angles queues
+the command, when the serial thread writes it, and when the device answers.
+Runs can use a real serial port or a simulated device, and a camera or a
+recorded video, so configurations can be compared offline.
+
+Usage:
+    python latency.py --source clip.mp4 --filters ema ma \\
+        --send-intervals 0 0.15 --resolutions 640x480 1280x720 -o latency.json
+
+Requirements:
+- opencv-python
+- mediapipe
+- numpy
+- pyserial
+"""
+
+import argparse
+import itertools
+import json
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from capture import open_capture
+from pc_ver import AngleFilter, HandTracker, SerialCommunicator
+from tracing import STAGES, LatencyTrace, SimulatedDevice
+
+
+class MovingAverageFilter:
+    """Per-finger moving average, as used by esp32_ver.HandTracker"""
+
+    def __init__(self, window_size: int = 5):
+        from esp32_ver import AngleFilter as FingerFilter
+
+        self.filters = [FingerFilter(window_size) for _ in range(5)]
+
+    def update(self, new_values: List[float]) -> List[float]:
+        return [f.update(v) for f, v in zip(self.filters, new_values)]
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+
+def make_filter(filter_type: str):
+    """
+    Create an angle filter by name
+    Args:
+        filter_type: 'ema' (pc_ver) or 'ma' (esp32_ver)
+    Returns:
+        Filter with update() and reset()
+    """
+    if filter_type == 'ema':
+        return AngleFilter(alpha=0.3)
+    if filter_type == 'ma':
+        return MovingAverageFilter()
+    raise ValueError(f"Unknown filter type: {filter_type}")
+
+
+def summarize(traces: List[LatencyTrace]) -> Dict[str, Dict[str, float]]:
+    """
+    Build latency distributions from traces
+    Args:
+        traces: Completed traces
+    Returns:
+        Dict of 'start->end' -> {n, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}
+    """
+    pairs = list(zip(STAGES, STAGES[1:])) + [('capture', 'write'), ('capture', 'echo')]
+    summary = {}
+
+    for start, end in pairs:
+        values = [t.elapsed(start, end) for t in traces]
+        values = np.array([v for v in values if v is not None]) * 1000
+        if len(values) == 0:
+            continue
+        summary[f"{start}->{end}"] = {
+            'n': int(len(values)),
+            'mean_ms': float(values.mean()),
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max()),
+        }
+
+    return summary
+
+
+def run_config(source, filter_type: str, send_interval: float, resolution: tuple,
+               frames: int, port: Optional[str] = None,
+               device: Optional[SimulatedDevice] = None) -> Dict[str, object]:
+    """
+    Measure one pipeline configuration
+    Args:
+        source: Camera index, video path or stream URL
+        filter_type: 'ema' or 'ma'
+        send_interval: Minimum seconds between commands
+        resolution: (width, height)
+        frames: Number of frames to run
+        port: Real serial port, or None to use the simulated device
+        device: Simulated device to use when no port is given
+    Returns:
+        Dict with the configuration, frame counts and latency summary
+    """
+    width, height = resolution
+    capture = open_capture(source, width=width, height=height)
+    if not capture.open():
+        raise RuntimeError(f"Cannot open {source}")
+
+    tracker = HandTracker()
+    angle_filter = make_filter(filter_type)
+    comm = SerialCommunicator()
+    comm.send_interval = send_interval
+    comm.verbose = False
+    if port:
+        if not comm.connect(port):
+            raise RuntimeError(f"Cannot open serial port {port}")
+    else:
+        comm.attach(device or SimulatedDevice())
+
+    traces = []
+    no_hand = 0
+
+    try:
+        for seq in range(frames):
+            ok, frame = capture.read()
+            if not ok:
+                break
+
+            # Recorded clips stand in for every resolution
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height))
+            frame = cv2.flip(frame, 1)
+
+            _, raw_angles = tracker.process_frame(frame, capture.last_capture_time)
+            if not tracker.new_result:
+                continue
+            if raw_angles is None:
+                no_hand += 1
+                continue
+
+            # Async backends answer for an earlier frame; time from its capture
+            trace = LatencyTrace(seq, tracker.last_result.frame_timestamp_ms / 1000)
+            trace.mark('process')
+
+            filtered_angles = angle_filter.update(raw_angles)
+            trace.mark('filter')
+
+            if comm.send_angles([int(a) for a in filtered_angles], trace):
+                traces.append(trace)
+
+        # Let the last answers come back
+        time.sleep(0.25)
+    finally:
+        capture.release()
+        comm.disconnect()
+
+    return {
+        'config': {
+            'filter': filter_type,
+            'send_interval': send_interval,
+            'resolution': f"{width}x{height}",
+            'device': port or 'simulated',
+        },
+        'frames': capture.frames_delivered,
+        'no_hand_frames': no_hand,
+        'commands': len(traces),
+        'capture': capture.stats(),
+        'latency': summarize(traces),
+    }
+
+
+def print_result(result: Dict[str, object]):
+    """Print one configuration's latency table"""
+    config = result['config']
+    print(f"\n📊 filter={config['filter']} send_interval={config['send_interval']}s "
+          f"resolution={config['resolution']} device={config['device']}")
+    print(f"   {result['frames']} frames, {result['no_hand_frames']} without a hand, "
+          f"{result['commands']} commands sent")
+    print(f"   {'stage':<18}{'n':>6}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)")
+    for stage, s in result['latency'].items():
+        print(f"   {stage:<18}{s['n']:>6}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+              f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['max_ms']:>9.2f}")
+
+
+def parse_resolution(value: str) -> tuple:
+    """Parse 'WIDTHxHEIGHT'"""
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Resolution must look like 640x480, got {value}")
+
+
+def main():
+    """Run every combination of the requested configurations"""
+    parser = argparse.ArgumentParser(description="Measure glass-to-servo latency")
+    parser.add_argument("--source", default="0", help="Camera index, recorded video or stream URL")
+    parser.add_argument("--port", default=None,
+                        help="Serial port of a device that answers each command "
+                             "(default: simulated device)")
+    parser.add_argument("--filters", nargs='+', choices=['ema', 'ma'], default=['ema'])
+    parser.add_argument("--send-intervals", nargs='+', type=float, default=[0.15])
+    parser.add_argument("--resolutions", nargs='+', type=parse_resolution,
+                        default=[(640, 480)])
+    parser.add_argument("--frames", type=int, default=300, help="Frames per configuration")
+    parser.add_argument("--device-delay", type=float, default=2.0,
+                        help="Simulated device processing time in ms")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for filter_type, send_interval, resolution in itertools.product(
+            args.filters, args.send_intervals, args.resolutions):
+        device = SimulatedDevice(args.baudrate, args.device_delay / 1000)
+        result = run_config(args.source, filter_type, send_interval, resolution,
+                            args.frames, port=args.port, device=device)
+        print_result(result)
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Microbenchmarks for the hand tracking hot paths.
+
+Times the per-frame functions of pc_ver.py and esp32_ver.py on synthetic
+landmarks and frames, so no camera, serial device or MediaPipe model is
+needed:
+- HandTracker.calculate_angle and get_finger_angles (pc_ver)
+- AngleFilter.update (pc_ver's EMA and esp32_ver's moving average)
+- command formatting in SerialCommunicator.send_angles and
+  esp32_ver HandTracker.send_to_robot
+- HandControlApp.draw_overlay
+
+Each benchmark reports ops/sec (best of several repeats) and, from
+tracemalloc, the peak bytes allocated during one call and the bytes still
+held after it. Results are compared against a checked-in baseline:
+    python microbench.py                       # compare to microbench_baseline.json
+    python microbench.py -k filter --tolerance 0.3
+    python microbench.py --save-baseline microbench_baseline.json
+
+Requirements:
+- opencv-python
+- mediapipe
+- numpy
+- pyserial
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+import esp32_ver
+import pc_ver
+from inference import InferenceBackend
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "microbench_baseline.json")
+
+# Landmark indices of each finger from base to tip, with the wrist at 0
+FINGER_CHAINS = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16], [17, 18, 19, 20]]
+
+# Bytes of allocation change ignored when comparing against the baseline
+ALLOC_SLACK_BYTES = 64
+
+
+class Point:
+    """Stand-in for a MediaPipe NormalizedLandmark"""
+
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x: float, y: float, z: float = 0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class SyntheticHand:
+    """Stand-in for a NormalizedLandmarkList: 21 points in .landmark"""
+
+    def __init__(self, points: np.ndarray):
+        self.landmark = [Point(float(x), float(y), float(z)) for x, y, z in points]
+
+
+def make_hands(count: int = 64, seed: int = 0) -> List[SyntheticHand]:
+    """
+    Build plausible hands with fingers bent by different amounts
+    Args:
+        count: Number of hands to cycle through
+        seed: Random seed
+    Returns:
+        List of synthetic hands
+    """
+    rng = np.random.default_rng(seed)
+    hands = []
+
+    for _ in range(count):
+        points = np.zeros((21, 3))
+        points[0] = (0.5, 0.8, 0.0)
+        for finger, chain in enumerate(FINGER_CHAINS):
+            # Fingers fan out from the wrist and curl by a random amount
+            direction = np.radians(-150 + finger * 25)
+            curl = rng.uniform(0, np.radians(60))
+            x, y = points[0, :2]
+            for joint, index in enumerate(chain):
+                length = 0.08 if joint == 0 else 0.04
+                x += length * np.cos(direction)
+                y += length * np.sin(direction)
+                points[index] = (x, y, rng.normal(0, 0.01))
+                direction += curl
+        points[:, :2] += rng.normal(0, 0.002, (21, 2))
+        hands.append(SyntheticHand(points))
+
+    return hands
+
+
+class NullWriter:
+    """Unbuffered stdout sink, so printed text is neither shown nor kept"""
+
+    def write(self, text: str) -> int:
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class NullSerial:
+    """Serial port stand-in that accepts and discards writes"""
+
+    is_open = True
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+def build_benchmarks(profile_dir: str) -> Dict[str, Callable[[int], object]]:
+    """
+    Set up every benchmark
+    Args:
+        profile_dir: Scratch directory for HandControlApp's calibration profiles
+    Returns:
+        Dict of name -> function taking the call index
+    """
+    hands = make_hands()
+    angle_sets = [[float(a) for a in np.random.default_rng(i).uniform(0, 180, 5)]
+                  for i in range(len(hands))]
+    int_angle_sets = [[int(a) for a in angles] for angles in angle_sets]
+    frame = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    mask = len(hands) - 1  # len(hands) is a power of two
+
+    # InferenceBackend() loads no model; only the per-frame methods are timed
+    tracker = pc_ver.HandTracker(backend=InferenceBackend())
+    points = [(p.x, p.y) for p in hands[0].landmark]
+
+    ema = pc_ver.AngleFilter(alpha=0.3)
+    moving_average = esp32_ver.AngleFilter(esp32_ver.SMOOTHING_WINDOW)
+
+    comm = pc_ver.SerialCommunicator()
+    comm.send_interval = 0
+    comm.verbose = False
+    comm.connected = True  # Queue commands without starting the serial thread
+
+    def send_angles(i):
+        comm.send_angles(int_angle_sets[i & mask])
+        return comm.command_queue.get_nowait()
+
+    # Skip esp32_ver.HandTracker.__init__, which opens the serial port and loads a model
+    esp32_tracker = esp32_ver.HandTracker.__new__(esp32_ver.HandTracker)
+    esp32_tracker.transport = None
+    esp32_tracker.serial_connection = NullSerial()
+
+    app = pc_ver.HandControlApp(profile_dir=profile_dir, backend=InferenceBackend())
+    app.current_fps = 30.0
+
+    return {
+        'pc.calculate_angle':
+            lambda i: tracker.calculate_angle(points[(i + 5) % 21], points[(i + 6) % 21],
+                                              points[(i + 8) % 21]),
+        'pc.get_finger_angles': lambda i: tracker.get_finger_angles(hands[i & mask]),
+        'pc.AngleFilter.update': lambda i: ema.update(angle_sets[i & mask]),
+        'esp32.AngleFilter.update': lambda i: moving_average.update(angle_sets[i & mask][0]),
+        'pc.send_angles': send_angles,
+        'esp32.send_to_robot': lambda i: esp32_tracker.send_to_robot(int_angle_sets[i & mask]),
+        'pc.draw_overlay': lambda i: app.draw_overlay(frame, angle_sets[i & mask]),
+    }
+
+
+def time_calls(func: Callable[[int], object], number: int) -> float:
+    """Seconds taken by number calls, with the garbage collector off"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for i in range(number):
+            func(i)
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def measure_allocations(func: Callable[[int], object], calls: int = 200) -> Dict[str, float]:
+    """
+    Measure memory allocated per call with tracemalloc
+    Args:
+        func: Benchmark function
+        calls: Calls to average over
+    Returns:
+        Dict with peak_alloc_bytes (mean peak above the starting point during
+        one call) and retained_bytes (mean growth per call)
+    """
+    tracemalloc.start()
+    try:
+        for i in range(20):
+            func(i)  # Warm caches before measuring
+
+        # Preallocated so the measurement itself retains nothing
+        peaks = np.zeros(calls)
+        start_total = tracemalloc.get_traced_memory()[0]
+        for i in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func(i)
+            peaks[i] = tracemalloc.get_traced_memory()[1] - before
+        end_total = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'peak_alloc_bytes': float(np.mean(peaks)),
+        'retained_bytes': (end_total - start_total) / calls,
+    }
+
+
+def run_benchmark(func: Callable[[int], object], min_time: float = 1.0,
+                  repeat: int = 5) -> Dict[str, float]:
+    """
+    Time one benchmark
+    Args:
+        func: Benchmark function taking the call index
+        min_time: Total seconds to spend timing
+        repeat: Number of timed repeats; the fastest gives ops/sec
+    Returns:
+        Dict of ops/sec, per-call times and allocations
+    """
+    # Find a call count that takes a measurable time
+    number = 1
+    while True:
+        elapsed = time_calls(func, number)
+        if elapsed >= 0.01:
+            break
+        number *= 2
+    number = max(1, int(number * (min_time / repeat) / elapsed))
+
+    per_call = np.array([time_calls(func, number) / number for _ in range(repeat)])
+    result = {
+        'ops_per_sec': float(1.0 / per_call.min()),
+        'best_us': float(per_call.min() * 1e6),
+        'median_us': float(np.median(per_call) * 1e6),
+        'calls': number * repeat,
+    }
+    result.update(measure_allocations(func))
+    return result
+
+
+def compare_to_baseline(results: Dict[str, Dict[str, float]],
+                        baseline: Dict[str, Dict[str, float]],
+                        tolerance: float = 0.2) -> List[str]:
+    """
+    Find benchmarks that regressed against a baseline
+    Args:
+        results: Current results
+        baseline: Stored baseline results
+        tolerance: Allowed relative change (0.2 = 20%)
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        limit = base['ops_per_sec'] * (1 - tolerance)
+        if result['ops_per_sec'] < limit:
+            regressions.append(f"{name}: {result['ops_per_sec']:,.0f} ops/s < {limit:,.0f} "
+                               f"(baseline {base['ops_per_sec']:,.0f})")
+
+        for key in ('peak_alloc_bytes', 'retained_bytes'):
+            if key not in base:
+                continue
+            limit = base[key] + abs(base[key]) * tolerance + ALLOC_SLACK_BYTES
+            if result[key] > limit:
+                regressions.append(f"{name}: {key} {result[key]:,.0f} > {limit:,.0f} "
+                                   f"(baseline {base[key]:,.0f})")
+
+    return regressions
+
+
+def environment() -> Dict[str, str]:
+    """Versions that affect the numbers"""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def main():
+    """Run the microbenchmarks"""
+    parser = argparse.ArgumentParser(description="Microbenchmark the hand tracking hot paths")
+    parser.add_argument("-k", "--select", default=None,
+                        help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=1.0,
+                        help="Seconds of timing per benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repeats per benchmark")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Baseline to compare against (default: microbench_baseline.json)")
+    parser.add_argument("--no-baseline", action="store_true", help="Skip the comparison")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression (default 20%%)")
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    parser.add_argument("--save-baseline", default=None,
+                        help="Write this run's results as a new baseline")
+    args = parser.parse_args()
+
+    # send_to_robot prints every command; keep the terminal out of the timing
+    with tempfile.TemporaryDirectory() as profile_dir, \
+            contextlib.redirect_stdout(NullWriter()):
+        benchmarks = build_benchmarks(profile_dir)
+        selected = {name: func for name, func in benchmarks.items()
+                    if not args.select or args.select in name}
+        results = {}
+        for name, func in selected.items():
+            results[name] = run_benchmark(func, args.min_time, args.repeat)
+            print(f"{name} done", file=sys.stderr)
+
+    baseline = None
+    if not args.no_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"\n  {'benchmark':<26}{'ops/sec':>12}{'best µs':>10}{'median µs':>11}"
+          f"{'peak B':>9}{'kept B':>8}{'vs base':>9}")
+    for name, r in results.items():
+        change = ""
+        if baseline and name in baseline['results']:
+            base = baseline['results'][name]['ops_per_sec']
+            change = f"{100 * (r['ops_per_sec'] / base - 1):+.0f}%"
+        print(f"  {name:<26}{r['ops_per_sec']:>12,.0f}{r['best_us']:>10.2f}"
+              f"{r['median_us']:>11.2f}{r['peak_alloc_bytes']:>9.0f}"
+              f"{r['retained_bytes']:>8.0f}{change:>9}")
+
+    report = {'environment': environment(), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"✅ Baseline written to {args.save_baseline}")
+        return
+
+    if baseline is None:
+        print("\n⚠️ No baseline to compare against")
+        return
+
+    if baseline['environment'] != report['environment']:
+        print(f"\n⚠️ Baseline was recorded on {baseline['environment']}; "
+              f"ops/sec are only comparable on the same machine")
+
+    regressions = compare_to_baseline(results, baseline['results'], args.tolerance)
+    if regressions:
+        print("\n❌ Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+"""
+ESP32-CAM MJPEG stream as a tracking input.
+
+MJPEGStream reads the board's multipart HTTP stream (http://<ip>:81/stream
+on the stock CameraWebServer firmware) on a background thread. Each JPEG is
+read straight into its own buffer using the part's Content-Length (or, for
+servers that omit it, by scanning for the JPEG end marker), then decoded on
+a small pool of threads. Only the newest frame is kept: JPEGs
+that arrive while every decoder is busy, and decoded frames that finish
+after a newer one, are dropped. read() has the same interface as
+capture.CameraCapture, so HandTracker.process_frame can use either.
+
+serve_mjpeg() replays a recorded MJPEG file (or any video) over a local
+HTTP server for testing without the board:
+    python mjpeg_stream.py serve recording.mjpeg --port 8081
+    python mjpeg_stream.py bench http://127.0.0.1:8081/stream --frames 300
+
+Requirements:
+- opencv-python
+- numpy
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+BOUNDARY = "123456789000000000000987654321"  # Same as the ESP32 CameraWebServer
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+
+
+class MJPEGStream:
+    """Threaded MJPEG-over-HTTP reader that always delivers the newest frame"""
+
+    def __init__(self, url: str, decode_workers: int = 2, timeout: float = 5.0,
+                 stats_window: int = 300):
+        """
+        Args:
+            url: Stream URL, e.g. http://192.168.4.1:81/stream
+            decode_workers: Number of JPEG decode threads
+            timeout: Socket timeout in seconds
+            stats_window: Number of samples kept for timing statistics
+        """
+        self.url = url
+        self.decode_workers = decode_workers
+        self.timeout = timeout
+
+        self.running = False
+        self.connection = None
+        self.response = None
+        self.negotiated: Dict[str, object] = {}
+        self.last_capture_time = None
+
+        # Newest JPEG waiting for a decoder: (seq, arrival time, bytes)
+        self._jpeg_slot = None
+        self._jpeg_cond = threading.Condition()
+
+        # Newest decoded frame: (seq, arrival time, frame)
+        self._frame = None
+        self._frame_cond = threading.Condition()
+        self._last_read_seq = 0
+
+        self._threads = []
+        self.error: Optional[str] = None
+
+        # Statistics
+        self.network_times = deque(maxlen=stats_window)
+        self.decode_times = deque(maxlen=stats_window)
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.dropped_before_decode = 0
+        self.dropped_after_decode = 0
+        self.frames_delivered = 0
+        self.bytes_received = 0
+
+    def open(self) -> bool:
+        """
+        Connect to the stream and start the reader and decoder threads
+        Returns:
+            True if the stream is running
+        """
+        parts = urlsplit(self.url)
+        try:
+            self.connection = http.client.HTTPConnection(
+                parts.hostname, parts.port or 80, timeout=self.timeout)
+            self.connection.request("GET", parts.path or "/")
+            self.response = self.connection.getresponse()
+        except OSError as e:
+            print(f"❌ Cannot connect to {self.url}: {e}")
+            return False
+
+        content_type = self.response.getheader("Content-Type", "")
+        if self.response.status != 200 or "multipart" not in content_type:
+            print(f"❌ {self.url} is not an MJPEG stream "
+                  f"({self.response.status}, {content_type})")
+            self.connection.close()
+            return False
+
+        self.negotiated = {'source': 'mjpeg', 'url': self.url, 'content_type': content_type}
+        self.running = True
+        self._threads = [threading.Thread(target=self._read_loop, daemon=True)]
+        self._threads += [threading.Thread(target=self._decode_loop, daemon=True)
+                          for _ in range(self.decode_workers)]
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def isOpened(self) -> bool:
+        """Match the cv2.VideoCapture interface"""
+        return self.running
+
+    def describe(self) -> str:
+        """Get a one-line summary of the stream"""
+        size = self.negotiated.get('size')
+        size_text = f"{size[0]}x{size[1]} " if size else ""
+        return f"MJPEG {size_text}from {self.url}, {self.decode_workers} decode threads"
+
+    def _read_part(self) -> Optional[Tuple[float, bytearray]]:
+        """
+        Read one JPEG part from the multipart body
+        Returns:
+            Tuple of (time the part's first header arrived, JPEG bytes),
+            or None at the end of the stream
+        """
+        fp = self.response
+        start = None
+        length = None
+
+        # Skip the boundary line and read the part headers. The clock starts
+        # at the first header so time spent waiting for the server to produce
+        # the next frame isn't counted as network time.
+        while True:
+            line = fp.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                if start is not None:
+                    break
+                continue
+            if line.startswith(b"--"):
+                continue
+            if start is None:
+                start = time.perf_counter()
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+
+        if length is None:
+            buf = self._read_until_eoi()
+            return None if buf is None else (start, buf)
+
+        # Read straight into a buffer of the right size; the decoder wraps it
+        # with np.frombuffer, so this is the only copy before decoding
+        buf = bytearray(length)
+        view = memoryview(buf)
+        received = 0
+        while received < length:
+            n = fp.readinto(view[received:])
+            if not n:
+                return None
+            received += n
+        return start, buf
+
+    def _read_until_eoi(self) -> Optional[bytearray]:
+        """
+        Read a part without a Content-Length by scanning for the JPEG end marker
+        Returns:
+            The JPEG bytes, or None at the end of the stream
+        """
+        fp = self.response
+        buf = bytearray()
+        while True:
+            # peek() returns what is already buffered without consuming it, so
+            # only the bytes up to the end marker are taken off the stream
+            data = fp.peek()
+            if not data:
+                return None
+            search_from = max(len(buf) - 1, 0)
+            buf += data
+            end = buf.find(JPEG_EOI, search_from)
+            if end < 0:
+                fp.read(len(data))
+                continue
+            fp.read(len(data) - (len(buf) - end - 2))
+            del buf[end + 2:]
+            break
+
+        if not buf.startswith(JPEG_SOI):
+            raise ValueError("part has no Content-Length and does not start with a JPEG marker")
+        return buf
+
+    def _read_loop(self):
+        """Background thread pulling JPEGs off the network"""
+        seq = 0
+        try:
+            while self.running:
+                part = self._read_part()
+                if part is None:
+                    self.error = "stream ended"
+                    break
+                now = time.perf_counter()
+                start, jpeg = part
+
+                seq += 1
+                self.frames_received += 1
+                self.bytes_received += len(jpeg)
+                self.network_times.append(now - start)
+
+                with self._jpeg_cond:
+                    if self._jpeg_slot is not None:
+                        # Every decoder is busy and a newer JPEG has arrived
+                        self.dropped_before_decode += 1
+                    self._jpeg_slot = (seq, now, jpeg)
+                    self._jpeg_cond.notify()
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            if self.running:
+                self.error = str(e)
+        finally:
+            self.running = False
+            with self._jpeg_cond:
+                self._jpeg_cond.notify_all()
+            with self._frame_cond:
+                self._frame_cond.notify_all()
+
+    def _decode_loop(self):
+        """Background thread decoding the newest JPEG"""
+        while True:
+            with self._jpeg_cond:
+                while self._jpeg_slot is None and self.running:
+                    self._jpeg_cond.wait()
+                if self._jpeg_slot is None:
+                    return
+                seq, arrival, jpeg = self._jpeg_slot
+                self._jpeg_slot = None
+
+            # cv2.imdecode releases the GIL, so decoders run in parallel
+            start = time.perf_counter()
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            self.decode_times.append(time.perf_counter() - start)
+            if frame is None:
+                continue
+            self.frames_decoded += 1
+
+            with self._frame_cond:
+                if self._frame is not None and self._frame[0] > seq:
+                    # Another decoder already published a newer frame
+                    self.dropped_after_decode += 1
+                    continue
+                if self._frame is not None and self._frame[0] > self._last_read_seq:
+                    # The consumer never picked up the previous frame
+                    self.dropped_after_decode += 1
+                self._frame = (seq, arrival, frame)
+                self._frame_cond.notify_all()
+
+            if 'size' not in self.negotiated:
+                self.negotiated['size'] = (frame.shape[1], frame.shape[0])
+
+    def read(self, timeout: Optional[float] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Wait for a frame newer than the last one returned
+        Args:
+            timeout: Seconds to wait (defaults to the socket timeout)
+        Returns:
+            Tuple of (success, frame)
+        """
+        deadline = time.perf_counter() + (self.timeout if timeout is None else timeout)
+        with self._frame_cond:
+            while self._frame is None or self._frame[0] <= self._last_read_seq:
+                remaining = deadline - time.perf_counter()
+                if not self.running or remaining <= 0:
+                    return False, None
+                self._frame_cond.wait(remaining)
+
+            seq, arrival, frame = self._frame
+
+        self._last_read_seq = seq
+        self.last_capture_time = arrival
+        self.frames_delivered += 1
+        return True, frame
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Get network and decode statistics
+        Returns:
+            Dict of frame counts, drop counts and timing in ms
+        """
+        result = {
+            'frames': self.frames_delivered,
+            'received': self.frames_received,
+            'decoded': self.frames_decoded,
+            'dropped': self.dropped_before_decode + self.dropped_after_decode,
+            'dropped_before_decode': self.dropped_before_decode,
+            'dropped_after_decode': self.dropped_after_decode,
+            'kbytes_received': self.bytes_received / 1024,
+        }
+        for name, times in (('network', self.network_times), ('decode', self.decode_times)):
+            if times:
+                values = np.array(times) * 1000
+                result[f'{name}_mean_ms'] = float(values.mean())
+                result[f'{name}_p95_ms'] = float(np.percentile(values, 95))
+        return result
+
+    def release(self):
+        """Stop the threads and close the connection"""
+        self.running = False
+        if self.connection is not None:
+            # Closing the socket wakes the reader out of a blocking recv
+            try:
+                if self.connection.sock is not None:
+                    self.connection.sock.shutdown(2)
+            except OSError:
+                pass
+            self.connection.close()
+            self.connection = None
+        with self._jpeg_cond:
+            self._jpeg_cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+
+def iter_jpegs(path: str) -> Iterator[bytes]:
+    """
+    Yield JPEG images from a recording
+    Args:
+        path: Raw MJPEG file (concatenated JPEGs) or any video OpenCV can read
+    """
+    if path.lower().endswith(('.mjpeg', '.mjpg')):
+        with open(path, 'rb') as f:
+            data = f.read()
+        start = data.find(JPEG_SOI)
+        while start >= 0:
+            end = data.find(JPEG_EOI, start + 2)
+            if end < 0:
+                break
+            yield data[start:end + 2]
+            start = data.find(JPEG_SOI, end + 2)
+        return
+
+    cap = cv2.VideoCapture(path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            if ok:
+                yield jpeg.tobytes()
+    finally:
+        cap.release()
+
+
+def serve_mjpeg(path: str, host: str = "127.0.0.1", port: int = 0, fps: float = 25,
+                loop: bool = True, content_length: bool = True) -> ThreadingHTTPServer:
+    """
+    Replay a recording as an ESP32-CAM style MJPEG stream
+    Args:
+        path: Raw MJPEG file or video
+        host: Address to bind
+        port: Port to bind (0 picks a free port)
+        fps: Frames per second to send
+        loop: Restart the recording when it ends
+        content_length: Send a Content-Length header with each part
+    Returns:
+        Running server; its URL is http://host:server.server_address[1]/stream
+    """
+    frames = list(iter_jpegs(path))
+    if not frames:
+        raise ValueError(f"No frames found in {path}")
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", f"multipart/x-mixed-replace;boundary={BOUNDARY}")
+            self.end_headers()
+
+            interval = 1.0 / fps
+            next_time = time.perf_counter()
+            try:
+                while True:
+                    for jpeg in frames:
+                        delay = next_time - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                        next_time += interval
+
+                        length = f"Content-Length: {len(jpeg)}\r\n" if content_length else ""
+                        self.wfile.write(
+                            f"\r\n--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                            f"{length}\r\n".encode())
+                        self.wfile.write(jpeg)
+                    if not loop:
+                        break
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Serve a recording, or measure a stream"""
+    parser = argparse.ArgumentParser(description="ESP32-CAM MJPEG stream tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Replay a recording as an MJPEG stream")
+    serve.add_argument("path", help="Raw .mjpeg file or video")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8081)
+    serve.add_argument("--fps", type=float, default=25)
+    serve.add_argument("--no-length", action="store_true",
+                       help="Omit Content-Length, like some camera firmwares")
+
+    bench = sub.add_parser("bench", help="Read a stream and report timing")
+    bench.add_argument("url", help="e.g. http://192.168.4.1:81/stream")
+    bench.add_argument("--frames", type=int, default=300)
+    bench.add_argument("--workers", type=int, default=2, help="Decode threads")
+    bench.add_argument("--work-ms", type=float, default=0,
+                       help="Simulated per-frame processing time in the consumer")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = serve_mjpeg(args.path, args.host, args.port, args.fps,
+                             content_length=not args.no_length)
+        print(f"✅ Streaming {args.path} at http://{args.host}:{server.server_address[1]}/stream")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    stream = MJPEGStream(args.url, decode_workers=args.workers)
+    if not stream.open():
+        return
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        ok, _ = stream.read()
+        if not ok:
+            print(f"⚠️ Stream stopped: {stream.error}")
+            break
+        if args.work_ms:
+            time.sleep(args.work_ms / 1000)
+    elapsed = time.perf_counter() - start
+    stream.release()
+
+    print(f"✅ {stream.describe()}")
+    stats = stream.stats()
+    print(f"  delivered_fps: {stats['frames'] / elapsed:.1f}")
+    for key, value in stats.items():
+        print(f"  {key}: {value:.2f}" if isinstance(value, float) else f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ Features:
 - Visual feedback and debugging overlay
 - Auto-detection of serial ports
 - Configurable parameters
+- Per-user calibration profiles saved to disk
 
 Requirements:
 - opencv-python
@@ -30,9 +31,19 @@ import serial.tools.list_ports
 import time
 import threading
 import queue
+from collections import deque
 from typing import List, Tuple, Optional, Dict
 import sys
 import math
+import argparse
+
+from capture import open_capture
+from inference import BACKENDS, InferenceBackend, LegacyHandsBackend, create_backend
+from fleet import Fleet, parse_endpoint
+from emg import DEFAULT_CHANNELS, FusionRecorder, open_emg
+from transport import DEFAULT_UDP_PORT, DEFAULT_WS_PORT, UDPTransport, WebSocketTransport
+from calibration import (CalibrationProfile, CalibrationSession, DEFAULT_PROFILE_DIR,
+                         load_profile, save_profile)
 
 class AngleFilter:
     """Exponential smoothing filter for angle values"""
@@ -75,6 +86,8 @@ class AngleFilter:
 class SerialCommunicator:
     """Handles serial communication with ESP32-CAM"""
     
+    label = "Serial"
+    
     def __init__(self, port: str = None, baudrate: int = 115200):
         """
         Initialize serial communicator
@@ -89,6 +102,10 @@ class SerialCommunicator:
         self.command_queue = queue.Queue()
         self.last_send_time = 0
         self.send_interval = 0.15  # 150ms between commands
+        self.verbose = True  # Log every sent/received line
+        
+        # (command, latency trace) written but not yet echoed by the device
+        self.pending_traces = deque(maxlen=32)
         
     def list_available_ports(self) -> List[str]:
         """
@@ -115,26 +132,34 @@ class SerialCommunicator:
             return False
         
         try:
-            self.serial_connection = serial.Serial(
+            connection = serial.Serial(
                 self.port, 
                 self.baudrate, 
                 timeout=1
             )
-            self.connected = True
-            print(f"✅ Connected to {self.port} at {self.baudrate} baud")
-            
-            # Start communication thread
-            self.comm_thread = threading.Thread(
-                target=self._communication_loop, 
-                daemon=True
-            )
-            self.comm_thread.start()
-            
-            return True
-            
         except serial.SerialException as e:
             print(f"❌ Failed to connect to {self.port}: {e}")
             return False
+        
+        self.attach(connection)
+        print(f"✅ Connected to {self.port} at {self.baudrate} baud")
+        return True
+    
+    def attach(self, connection):
+        """
+        Start communicating over an already open serial-like connection
+        Args:
+            connection: Object with write, readline, in_waiting and close
+        """
+        self.serial_connection = connection
+        self.connected = True
+        
+        # Start communication thread
+        self.comm_thread = threading.Thread(
+            target=self._communication_loop, 
+            daemon=True
+        )
+        self.comm_thread.start()
     
     def disconnect(self):
         """Disconnect from serial port"""
@@ -143,11 +168,12 @@ class SerialCommunicator:
             self.serial_connection.close()
             print(f"🔌 Disconnected from {self.port}")
     
-    def send_angles(self, angles: List[int]) -> bool:
+    def send_angles(self, angles: List[int], trace=None) -> bool:
         """
         Send finger angles to ESP32-CAM
         Args:
             angles: List of 5 finger angles (0-180°)
+            trace: Optional latency trace stamped as the command moves along
         Returns:
             True if command was queued successfully
         """
@@ -163,9 +189,12 @@ class SerialCommunicator:
         angle_str = ','.join(map(str, angles))
         command = f"MIMIC {angle_str}"
         
+        if trace is not None:
+            trace.mark('queued')
+        
         if self.connected:
             try:
-                self.command_queue.put(command, block=False)
+                self.command_queue.put((command, trace), block=False)
                 return True
             except queue.Full:
                 print("⚠️ Command queue full")
@@ -175,15 +204,35 @@ class SerialCommunicator:
             print(f"🤖 Would send: {command}")
             return True
     
+    def _match_echo(self, response: str):
+        """
+        Mark the trace of the command a device line echoes
+        Unrelated lines (debug output) match nothing. The device answers in
+        order, so older commands still pending will never be echoed and are
+        dropped.
+        Args:
+            response: Line received from the device
+        """
+        for i, (command, trace) in enumerate(self.pending_traces):
+            if response == command or response.endswith(" " + command):
+                trace.mark('echo')
+                for _ in range(i + 1):
+                    self.pending_traces.popleft()
+                return
+    
     def _communication_loop(self):
         """Background thread for serial communication"""
         while self.connected and self.serial_connection:
             try:
                 # Send queued commands
                 try:
-                    command = self.command_queue.get_nowait()
+                    command, trace = self.command_queue.get_nowait()
                     self.serial_connection.write(f"{command}\n".encode())
-                    print(f"📤 Sent: {command}")
+                    if trace is not None:
+                        trace.mark('write')
+                        self.pending_traces.append((command, trace))
+                    if self.verbose:
+                        print(f"📤 Sent: {command}")
                 except queue.Empty:
                     pass
                 
@@ -191,7 +240,9 @@ class SerialCommunicator:
                 if self.serial_connection.in_waiting > 0:
                     response = self.serial_connection.readline().decode().strip()
                     if response:
-                        print(f"📥 ESP32: {response}")
+                        self._match_echo(response)
+                        if self.verbose:
+                            print(f"📥 ESP32: {response}")
                 
                 time.sleep(0.01)
                 
@@ -203,20 +254,22 @@ class HandTracker:
     """MediaPipe-based hand tracking and angle calculation"""
     
     def __init__(self, min_detection_confidence: float = 0.7, 
-                 min_tracking_confidence: float = 0.5):
+                 min_tracking_confidence: float = 0.5,
+                 backend: Optional[InferenceBackend] = None):
         """
         Initialize hand tracker
         Args:
             min_detection_confidence: Minimum confidence for hand detection
             min_tracking_confidence: Minimum confidence for hand tracking
+            backend: Landmark inference backend (default: mp.solutions Hands)
         """
         self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=1,
+        self.backend = backend or LegacyHandsBackend(
             min_detection_confidence=min_detection_confidence,
             min_tracking_confidence=min_tracking_confidence
         )
+        self.last_result = None
+        self.new_result = False
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
         
@@ -293,50 +346,87 @@ class HandTracker:
         
         return angles
     
-    def process_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, Optional[List[float]]]:
+    def process_frame(self, frame: np.ndarray,
+                      capture_time: Optional[float] = None) -> Tuple[np.ndarray, Optional[List[float]]]:
         """
         Process video frame and extract hand angles
         Args:
             frame: Input video frame
+            capture_time: perf_counter time the frame was captured (default: now)
         Returns:
-            Tuple of (annotated_frame, finger_angles)
+            Tuple of (annotated_frame, finger_angles); finger_angles is None
+            when no hand was found or an async backend has no new result
+            (see new_result)
         """
         # Convert BGR to RGB
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        # Process the frame
-        results = self.hands.process(rgb_frame)
+        # Process the frame (async backends return a result for an earlier frame
+        # once it finishes; its frame_timestamp_ms says which)
+        if capture_time is None:
+            capture_time = time.perf_counter()
+        result = self.backend.process(rgb_frame, int(capture_time * 1000))
+        self.new_result = self.backend.new_result
+        if self.new_result:
+            self.last_result = result
         
         annotated_frame = frame.copy()
         finger_angles = None
         
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                # Draw hand landmarks
-                self.mp_drawing.draw_landmarks(
-                    annotated_frame,
-                    hand_landmarks,
-                    self.mp_hands.HAND_CONNECTIONS,
-                    self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                    self.mp_drawing_styles.get_default_hand_connections_style()
-                )
-                
-                # Calculate finger angles
-                finger_angles = self.get_finger_angles(hand_landmarks)
-                
-                # Only process first detected hand
-                break
+        if result is not None:
+            hand_landmarks = result.hand_landmarks
+            
+            # Draw hand landmarks
+            self.mp_drawing.draw_landmarks(
+                annotated_frame,
+                hand_landmarks,
+                self.mp_hands.HAND_CONNECTIONS,
+                self.mp_drawing_styles.get_default_hand_landmarks_style(),
+                self.mp_drawing_styles.get_default_hand_connections_style()
+            )
+            
+            # Calculate finger angles
+            finger_angles = self.get_finger_angles(hand_landmarks)
         
         return annotated_frame, finger_angles
 
 class HandControlApp:
     """Main application class"""
     
-    def __init__(self):
-        """Initialize the hand control application"""
-        self.hand_tracker = HandTracker()
+    def __init__(self, profile_name: str = "default",
+                 profile_dir: str = DEFAULT_PROFILE_DIR, comm=None,
+                 emg=None, emg_record_path: Optional[str] = None,
+                 backend: Optional[InferenceBackend] = None):
+        """
+        Initialize the hand control application
+        Args:
+            profile_name: Calibration profile to load and save
+            profile_dir: Directory holding calibration profiles
+            comm: Link to the robot with a send_angles method
+                  (defaults to a SerialCommunicator)
+            emg: Optional EMGIngest whose features are recorded with each frame
+            emg_record_path: Where to save the fused EMG/angle recording
+            backend: Landmark inference backend (defaults to mp.solutions Hands)
+        """
+        self.hand_tracker = HandTracker(backend=backend)
         self.angle_filter = AngleFilter(alpha=0.3)
-        self.serial_comm = SerialCommunicator()
+        self.serial_comm = comm or SerialCommunicator()
+        
+        # Calibration
+        self.profile_name = profile_name
+        self.profile_dir = profile_dir
+        self.calibration: Optional[CalibrationProfile] = load_profile(profile_name, profile_dir)
+        self.calibration_session: Optional[CalibrationSession] = None
+        
+        # EMG ingestion runs on its own thread; frames only look up features
+        self.emg = emg
+        self.emg_recorder = FusionRecorder(emg) if emg and emg_record_path else None
+        self.emg_record_path = emg_record_path
+        
+        if self.calibration:
+            print(f"✅ Loaded calibration profile '{profile_name}'")
+        else:
+            print(f"⚠️ No calibration profile '{profile_name}', using raw angles (press 'c' to calibrate)")
         
         self.cap = None
         self.running = False
@@ -346,25 +436,23 @@ class HandControlApp:
         
         self.last_angles = [90, 90, 90, 90, 90]  # Default middle position
         
-    def setup_camera(self, camera_id: int = 0) -> bool:
+    def setup_camera(self, camera_id=0, pixel_format: Optional[str] = 'MJPG') -> bool:
         """
         Initialize camera capture
         Args:
-            camera_id: Camera device ID
+            camera_id: Camera device ID, path to a recorded video or
+                       ESP32-CAM stream URL
+            pixel_format: Camera pixel format ('MJPG', 'YUYV' or None)
         Returns:
             True if camera initialized successfully
         """
-        self.cap = cv2.VideoCapture(camera_id)
-        if not self.cap.isOpened():
+        self.cap = open_capture(camera_id, width=640, height=480, fps=30,
+                                pixel_format=pixel_format, buffer_size=1)
+        if not self.cap.open():
             print(f"❌ Cannot open camera {camera_id}")
             return False
         
-        # Set camera properties
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        print(f"✅ Camera {camera_id} initialized")
+        print(f"✅ Camera {camera_id} initialized: {self.cap.describe()}")
         return True
     
     def setup_serial(self) -> bool:
@@ -442,9 +530,18 @@ class HandControlApp:
         # Draw connection status
         status_text = "Connected" if self.serial_comm.connected else "Disconnected"
         status_color = (0, 255, 0) if self.serial_comm.connected else (0, 0, 255)
-        cv2.putText(frame, f"Serial: {status_text}", (20, height - 60), 
+        cv2.putText(frame, f"{self.serial_comm.label}: {status_text}", (20, height - 60), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, status_color, 2)
         
+        # Draw calibration status
+        if self.calibration_session:
+            cv2.putText(frame, self.calibration_session.prompt, (20, height - 90),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        else:
+            profile_text = self.profile_name if self.calibration else "none"
+            cv2.putText(frame, f"Profile: {profile_text}", (20, height - 90),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        
         # Draw instructions
         instructions = [
             "Press 'q' to quit",
@@ -469,16 +566,57 @@ class HandControlApp:
             self.fps_counter = 0
             self.fps_start_time = current_time
     
-    def run(self):
-        """Main application loop"""
+    def start_calibration(self):
+        """Start recording a new calibration profile"""
+        self.calibration_session = CalibrationSession(self.hand_tracker.finger_names)
+        print("🎯 Calibration started: hold your hand open, then make a fist")
+    
+    def update_calibration(self, raw_angles: Optional[List[float]]):
+        """
+        Feed a frame to the running calibration session
+        Args:
+            raw_angles: Uncalibrated finger angles, or None if no hand detected
+        """
+        if not self.calibration_session.update(raw_angles):
+            return
+        
+        self.calibration = self.calibration_session.build_profile(self.profile_name)
+        self.calibration_session = None
+        self.angle_filter.reset()
+        
+        try:
+            path = save_profile(self.calibration, self.profile_dir)
+            print(f"✅ Calibration saved to {path}")
+        except OSError as e:
+            print(f"⚠️ Calibration applied but could not be saved: {e}")
+    
+    def result_capture_time(self) -> Optional[float]:
+        """perf_counter capture time of the frame behind the newest hand result"""
+        result = self.hand_tracker.last_result
+        return None if result is None else result.frame_timestamp_ms / 1000
+    
+    def run(self, camera_id=0, pixel_format: Optional[str] = 'MJPG'):
+        """
+        Main application loop
+        Args:
+            camera_id: Camera device ID or path to a recorded video
+            pixel_format: Camera pixel format ('MJPG', 'YUYV' or None)
+        """
         print("🤖 === Hand Control Application ===")
         
         # Setup camera
-        if not self.setup_camera():
+        if not self.setup_camera(camera_id, pixel_format):
             return
         
-        # Setup serial (optional)
-        self.setup_serial()
+        # Setup serial (optional) or the network link
+        if isinstance(self.serial_comm, SerialCommunicator):
+            self.setup_serial()
+        elif not self.serial_comm.connect():
+            print("⚠️ Running without a robot connection")
+        
+        if self.emg:
+            self.emg.start()
+            print(f"✅ EMG ingestion started ({self.emg.channels} channels)")
         
         print("\n🚀 Starting hand tracking...")
         print("Press 'q' to quit, 'r' to reset filter, 'c' to recalibrate")
@@ -497,9 +635,19 @@ class HandControlApp:
                 frame = cv2.flip(frame, 1)
                 
                 # Process frame
-                annotated_frame, raw_angles = self.hand_tracker.process_frame(frame)
+                annotated_frame, raw_angles = self.hand_tracker.process_frame(
+                    frame, self.cap.last_capture_time)
                 
-                if raw_angles is not None:
+                if self.calibration_session:
+                    # Record calibration samples instead of driving the servos
+                    if self.hand_tracker.new_result:
+                        self.update_calibration(raw_angles)
+                    display_frame = self.draw_overlay(annotated_frame, self.last_angles)
+                elif raw_angles is not None:
+                    # Map to servo angles using the calibration profile
+                    if self.calibration:
+                        raw_angles = self.calibration.apply(raw_angles).tolist()
+                    
                     # Filter angles
                     filtered_angles = self.angle_filter.update(raw_angles)
                     
@@ -512,6 +660,10 @@ class HandControlApp:
                     # Update last known angles
                     self.last_angles = int_angles
                     
+                    # Pair the angles with EMG features from their frame's capture time
+                    if self.emg_recorder:
+                        self.emg_recorder.add_frame(self.result_capture_time(), int_angles)
+                    
                     # Draw overlay
                     display_frame = self.draw_overlay(annotated_frame, int_angles)
                 else:
@@ -532,8 +684,7 @@ class HandControlApp:
                     self.angle_filter.reset()
                     print("🔄 Filter reset")
                 elif key == ord('c'):
-                    # Recalibration placeholder
-                    print("🎯 Recalibration (not implemented)")
+                    self.start_calibration()
                 
         except KeyboardInterrupt:
             print("\n⏹️ Interrupted by user")
@@ -547,18 +698,88 @@ class HandControlApp:
         self.running = False
         
         if self.cap:
+            stats = self.cap.stats()
+            if 'interval_mean_ms' in stats:
+                print(f"📷 {stats['frames']} frames, {stats['dropped']} stale dropped, "
+                      f"interval {stats['interval_mean_ms']:.1f}ms "
+                      f"(p95 {stats['interval_p95_ms']:.1f}ms)")
+            elif 'decode_mean_ms' in stats:
+                print(f"📷 {stats['frames']} frames, {stats['dropped']} stale dropped, "
+                      f"network {stats['network_mean_ms']:.1f}ms, "
+                      f"decode {stats['decode_mean_ms']:.1f}ms")
             self.cap.release()
         
         cv2.destroyAllWindows()
         self.serial_comm.disconnect()
+        self.hand_tracker.backend.close()
+        
+        if self.emg:
+            self.emg.stop()
+            print(f"🔌 EMG stopped: {self.emg.stats()}")
+            if self.emg_recorder and self.emg_recorder.times:
+                path = self.emg_recorder.save(self.emg_record_path)
+                print(f"💾 Saved {len(self.emg_recorder.times)} fused frames to {path}")
         
         print("✅ Cleanup complete")
 
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Hand tracking control for the RoboHand")
+    parser.add_argument("--profile", default="default",
+                        help="Calibration profile name to load and save")
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR,
+                        help="Directory holding calibration profiles")
+    parser.add_argument("--camera", default="0",
+                        help="Camera index, path to a recorded video, or ESP32-CAM "
+                             "stream URL (e.g. http://192.168.4.1:81/stream)")
+    parser.add_argument("--pixel-format", choices=['MJPG', 'YUYV'], default='MJPG',
+                        help="Camera pixel format to request")
+    parser.add_argument("--transport", choices=['serial', 'udp', 'ws'], default='serial',
+                        help="Link to the ESP32-CAM")
+    parser.add_argument("--host", default=None,
+                        help="ESP32-CAM address for the udp/ws transports")
+    parser.add_argument("--net-port", type=int, default=None,
+                        help=f"ESP32-CAM port (default: {DEFAULT_UDP_PORT} for udp, "
+                             f"{DEFAULT_WS_PORT} for ws)")
+    parser.add_argument("--endpoints", nargs='+', default=None,
+                        help="Drive several devices from one event loop instead of --transport, "
+                             "e.g. serial:/dev/ttyUSB0 udp:192.168.4.2 ws:192.168.4.3")
+    parser.add_argument("--emg", default=None,
+                        help="EMG serial port or .bin/.npy recording to fuse with the angles")
+    parser.add_argument("--emg-channels", type=int, default=DEFAULT_CHANNELS,
+                        help="Number of EMG channels")
+    parser.add_argument("--emg-record", default=None,
+                        help="Save fused angles and EMG features to this .npz file")
+    parser.add_argument("--backend", choices=list(BACKENDS), default='legacy',
+                        help="Hand landmark inference backend")
+    parser.add_argument("--model", default=None,
+                        help="Model file for the tasks (.task) or onnx (.onnx) backend")
+    return parser.parse_args()
+
 def main():
     """Main entry point"""
+    args = parse_args()
+    
+    comm = None
+    if args.endpoints:
+        # Same pace per device as SerialCommunicator
+        comm = Fleet(parse_endpoint(spec, send_interval=0.15) for spec in args.endpoints)
+    elif args.transport != 'serial':
+        if not args.host:
+            print("❌ --host is required for the udp/ws transports")
+            return
+        if args.transport == 'udp':
+            comm = UDPTransport(args.host, args.net_port or DEFAULT_UDP_PORT)
+        else:
+            comm = WebSocketTransport(args.host, args.net_port or DEFAULT_WS_PORT)
+    
     try:
-        app = HandControlApp()
-        app.run()
+        emg = open_emg(args.emg, channels=args.emg_channels) if args.emg else None
+        backend = create_backend(args.backend, args.model)
+        app = HandControlApp(profile_name=args.profile, profile_dir=args.profile_dir,
+                             comm=comm, emg=emg, emg_record_path=args.emg_record,
+                             backend=backend)
+        app.run(args.camera, args.pixel_format)
     except Exception as e:
         print(f"❌ Fatal error: {e}")
         import traceback
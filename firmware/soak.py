@@ -0,0 +1,425 @@
+"""
+Long-running soak benchmark for the hand tracking pipeline.
+
+Drives HandControlApp's full pipeline (capture, process_frame, filter,
+send_angles into a simulated device, draw_overlay) from a replayed video or
+a synthetic source for a set duration. At every interval it samples RSS,
+the top tracemalloc allocators, CPU time, FPS, the serial command queue
+depth and per-stage latency. The report is written as JSON and compared
+against a stored baseline to flag memory growth, FPS decay or slower stages.
+
+Usage:
+    python soak.py --duration 3600 --source clip.mp4 -o soak.json
+    python soak.py --duration 600 --baseline soak_baseline.json
+
+Requirements:
+- opencv-python
+- mediapipe
+- numpy
+- pyserial
+- psutil (optional, for RSS on non-Linux systems)
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from capture import open_capture
+from tracing import SimulatedDevice
+from pc_ver import HandControlApp
+
+STAGES = ['capture', 'process', 'filter', 'send', 'overlay']
+
+
+def get_rss_mb() -> float:
+    """Get the resident set size of this process in MB"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return float('nan')
+
+
+class SyntheticSource:
+    """Generated frames and finger angles at a fixed frame rate"""
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 30):
+        self.width = width
+        self.height = height
+        self.frame_interval = 1.0 / fps
+        self.start_time = time.perf_counter()
+        self.next_frame_time = self.start_time
+        self.frames_delivered = 0
+        self.last_wait_time = 0.0
+
+    def read(self):
+        """Wait for the next frame time and return a moving test pattern"""
+        delay = self.next_frame_time - time.perf_counter()
+        self.last_wait_time = max(delay, 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        self.next_frame_time += self.frame_interval
+
+        frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        x = int((self.frames_delivered * 4) % self.width)
+        cv2.rectangle(frame, (x, 100), (x + 80, 380), (200, 180, 160), -1)
+        self.frames_delivered += 1
+        return True, frame
+
+    def angles(self) -> List[float]:
+        """Finger angles sweeping between open and closed"""
+        t = time.perf_counter() - self.start_time
+        return [90 + 80 * math.sin(t * 2 + i) for i in range(5)]
+
+    def release(self):
+        pass
+
+
+class SoakRun:
+    """Runs the pipeline and samples resource use at intervals"""
+
+    def __init__(self, source: Optional[str], duration: float, interval: float,
+                 send_interval: float = 0.15, top_allocators: int = 10):
+        """
+        Args:
+            source: Video path to replay, or None for the synthetic source
+            duration: Seconds to run
+            interval: Seconds between samples
+            send_interval: Minimum seconds between serial commands
+            top_allocators: Number of tracemalloc entries kept per sample
+        """
+        self.source_path = source
+        self.duration = duration
+        self.interval = interval
+        self.top_allocators = top_allocators
+
+        self.app = HandControlApp()
+        self.app.serial_comm.send_interval = send_interval
+        self.app.serial_comm.verbose = False
+        self.app.serial_comm.attach(SimulatedDevice())
+
+        self.source = self._open_source()
+        self.samples: List[Dict[str, object]] = []
+        self.stage_times = {stage: [] for stage in STAGES}
+        self.frames = 0
+        self.hand_frames = 0
+
+    def _open_source(self):
+        """Open the replayed video, or the synthetic source"""
+        if self.source_path is None:
+            return SyntheticSource()
+        capture = open_capture(self.source_path)
+        if not capture.open():
+            raise RuntimeError(f"Cannot open {self.source_path}")
+        return capture
+
+    def _read(self):
+        """Read a frame, looping the replayed video"""
+        ok, frame = self.source.read()
+        if not ok and self.source_path is not None:
+            self.source.release()
+            self.source = self._open_source()
+            ok, frame = self.source.read()
+        return ok, frame
+
+    def step(self):
+        """Run one frame through the whole pipeline"""
+        t0 = time.perf_counter()
+        ok, frame = self._read()
+        if not ok:
+            raise RuntimeError("Source stopped delivering frames")
+        frame = cv2.flip(frame, 1)
+        t1 = time.perf_counter()
+        # Waiting for the next frame to be due is pacing, not capture work
+        capture_wait = getattr(self.source, 'last_wait_time', 0.0)
+
+        annotated_frame, raw_angles = self.app.hand_tracker.process_frame(frame)
+        t2 = time.perf_counter()
+
+        if raw_angles is None and isinstance(self.source, SyntheticSource):
+            raw_angles = self.source.angles()
+        if raw_angles is not None:
+            self.hand_frames += 1
+            filtered_angles = self.app.angle_filter.update(raw_angles)
+            self.app.last_angles = [int(angle) for angle in filtered_angles]
+        t3 = time.perf_counter()
+
+        if raw_angles is not None:
+            self.app.serial_comm.send_angles(self.app.last_angles)
+        t4 = time.perf_counter()
+
+        self.app.draw_overlay(annotated_frame, self.app.last_angles)
+        self.app.update_fps()
+        t5 = time.perf_counter()
+
+        starts = (t0 + capture_wait, t1, t2, t3, t4)
+        for stage, start, end in zip(STAGES, starts, (t1, t2, t3, t4, t5)):
+            self.stage_times[stage].append(end - start)
+        self.frames += 1
+
+    def sample(self, elapsed: float, wall_delta: float, cpu_delta: float,
+               frames_delta: int, baseline_snapshot) -> Dict[str, object]:
+        """
+        Record one sample and reset the per-interval stage timings
+        Returns:
+            The sample
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        top = snapshot.compare_to(baseline_snapshot, 'lineno')[:self.top_allocators]
+        traced_current, traced_peak = tracemalloc.get_traced_memory()
+
+        stages = {}
+        for stage, times in self.stage_times.items():
+            if times:
+                values = np.array(times) * 1000
+                stages[stage] = {
+                    'p50_ms': float(np.percentile(values, 50)),
+                    'p95_ms': float(np.percentile(values, 95)),
+                }
+            times.clear()
+
+        entry = {
+            'elapsed_s': elapsed,
+            'rss_mb': get_rss_mb(),
+            'traced_mb': traced_current / 1e6,
+            'traced_peak_mb': traced_peak / 1e6,
+            'cpu_percent': 100 * cpu_delta / wall_delta if wall_delta > 0 else 0.0,
+            'fps': frames_delta / wall_delta if wall_delta > 0 else 0.0,
+            'command_queue': self.app.serial_comm.command_queue.qsize(),
+            'stages': stages,
+            'top_allocators': [
+                {'where': str(stat.traceback[0]), 'size_diff_kb': stat.size_diff / 1024,
+                 'count_diff': stat.count_diff}
+                for stat in top
+            ],
+        }
+        self.samples.append(entry)
+        return entry
+
+    def run(self) -> Dict[str, object]:
+        """
+        Run for the configured duration
+        Returns:
+            Report dict with the samples and a summary
+        """
+        tracemalloc.start()
+        start_snapshot = tracemalloc.take_snapshot()
+
+        start = time.perf_counter()
+        last_wall = start
+        last_cpu = time.process_time()
+        last_frames = 0
+        next_sample = start + self.interval
+
+        try:
+            while True:
+                self.step()
+                now = time.perf_counter()
+                # Stop on time, with a final sample, even between sample points
+                done = now - start >= self.duration
+                if now < next_sample and not done:
+                    continue
+
+                cpu = time.process_time()
+                entry = self.sample(now - start, now - last_wall, cpu - last_cpu,
+                                    self.frames - last_frames, start_snapshot)
+                print(f"⏱️ {entry['elapsed_s']:7.0f}s  RSS {entry['rss_mb']:7.1f}MB  "
+                      f"traced {entry['traced_mb']:6.2f}MB  CPU {entry['cpu_percent']:5.1f}%  "
+                      f"FPS {entry['fps']:5.1f}  queue {entry['command_queue']}")
+
+                last_wall, last_cpu, last_frames = now, cpu, self.frames
+                next_sample += self.interval
+                if done:
+                    break
+        finally:
+            tracemalloc.stop()
+            self.source.release()
+            self.app.serial_comm.disconnect()
+
+        return {
+            'config': {
+                'source': self.source_path or 'synthetic',
+                'duration_s': self.duration,
+                'interval_s': self.interval,
+                'send_interval_s': self.app.serial_comm.send_interval,
+            },
+            'frames': self.frames,
+            'hand_frames': self.hand_frames,
+            'summary': summarize(self.samples),
+            'samples': self.samples,
+        }
+
+
+def _slope_per_hour(x: List[float], y: List[float]) -> float:
+    """Least-squares slope of y over x (seconds), scaled to per hour"""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    mask = np.isfinite(y)
+    if mask.sum() < 2:
+        return 0.0
+    return float(np.polyfit(x[mask], y[mask], 1)[0] * 3600)
+
+
+def summarize(samples: List[Dict[str, object]]) -> Dict[str, float]:
+    """
+    Reduce samples to the metrics compared against a baseline
+    The first sample is skipped as warm-up when there are enough samples.
+    Returns:
+        Dict of metric name -> value
+    """
+    if len(samples) > 2:
+        samples = samples[1:]
+    if not samples:
+        return {}
+
+    elapsed = [s['elapsed_s'] for s in samples]
+    summary = {
+        'rss_growth_mb_per_hour': _slope_per_hour(elapsed, [s['rss_mb'] for s in samples]),
+        'traced_growth_mb_per_hour': _slope_per_hour(elapsed, [s['traced_mb'] for s in samples]),
+        'fps_change_per_hour': _slope_per_hour(elapsed, [s['fps'] for s in samples]),
+        'fps_mean': float(np.mean([s['fps'] for s in samples])),
+        'cpu_percent_mean': float(np.mean([s['cpu_percent'] for s in samples])),
+        'command_queue_max': float(max(s['command_queue'] for s in samples)),
+    }
+    for stage in STAGES:
+        values = [s['stages'][stage]['p95_ms'] for s in samples if stage in s['stages']]
+        if values:
+            summary[f'{stage}_p95_ms'] = float(np.median(values))
+    return summary
+
+
+# Level metrics where larger is worse, and the absolute slack allowed on top
+# of the relative tolerance so near-zero baselines don't flag noise
+HIGHER_IS_WORSE = {
+    'cpu_percent_mean': 5.0,
+    'command_queue_max': 2.0,
+}
+LOWER_IS_WORSE = {
+    'fps_mean': 1.0,
+}
+STAGE_SLACK_MS = 1.0
+
+# Drift metrics (per-hour slopes) are noisy and can have either sign, so a
+# relative tolerance around the baseline is meaningless. They are compared
+# against the baseline clamped to "no drift" plus an absolute allowance:
+# growth may not exceed max(baseline, 0) + allowance, and FPS may not fall
+# faster than min(baseline, 0) - allowance.
+GROWTH_ALLOWANCE = {
+    'rss_growth_mb_per_hour': 10.0,
+    'traced_growth_mb_per_hour': 2.0,
+}
+DECLINE_ALLOWANCE = {
+    'fps_change_per_hour': 10.0,
+}
+
+
+def compare_to_baseline(summary: Dict[str, float], baseline: Dict[str, float],
+                        tolerance: float = 0.2) -> List[str]:
+    """
+    Find metrics that regressed against a baseline
+    Args:
+        summary: Current run summary
+        baseline: Stored baseline summary
+        tolerance: Allowed relative change (0.2 = 20%)
+    Returns:
+        List of regression descriptions (empty if none)
+    """
+    regressions = []
+
+    for name, value in summary.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+
+        if name in GROWTH_ALLOWANCE:
+            limit = max(base, 0.0) + GROWTH_ALLOWANCE[name]
+            if value > limit:
+                regressions.append(f"{name}: {value:.2f} > {limit:.2f} (baseline {base:.2f})")
+        elif name in DECLINE_ALLOWANCE:
+            limit = min(base, 0.0) - DECLINE_ALLOWANCE[name]
+            if value < limit:
+                regressions.append(f"{name}: {value:.2f} < {limit:.2f} (baseline {base:.2f})")
+        elif name in LOWER_IS_WORSE:
+            limit = base - abs(base) * tolerance - LOWER_IS_WORSE[name]
+            if value < limit:
+                regressions.append(f"{name}: {value:.2f} < {limit:.2f} (baseline {base:.2f})")
+        else:
+            slack = HIGHER_IS_WORSE.get(name, STAGE_SLACK_MS)
+            limit = base + abs(base) * tolerance + slack
+            if value > limit:
+                regressions.append(f"{name}: {value:.2f} > {limit:.2f} (baseline {base:.2f})")
+
+    return regressions
+
+
+def main():
+    """Run the soak benchmark"""
+    parser = argparse.ArgumentParser(description="Soak-test the hand tracking pipeline")
+    parser.add_argument("--source", default=None,
+                        help="Video or stream URL to replay (default: synthetic frames)")
+    parser.add_argument("--duration", type=float, default=3600, help="Seconds to run")
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between samples")
+    parser.add_argument("--send-interval", type=float, default=0.15)
+    parser.add_argument("-o", "--output", default="soak_report.json", help="Report path")
+    parser.add_argument("--baseline", default=None, help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression (default 20%%)")
+    parser.add_argument("--save-baseline", default=None,
+                        help="Also write this run's summary as a new baseline")
+    args = parser.parse_args()
+
+    # summarize() drops the first sample as warm-up, and drift needs two more
+    if args.interval <= 0 or math.ceil(args.duration / args.interval) < 3:
+        parser.error(f"--duration {args.duration:g} with --interval {args.interval:g} gives "
+                     f"fewer than 3 samples; drift can't be measured")
+
+    report = SoakRun(args.source, args.duration, args.interval, args.send_interval).run()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['baseline'] = args.baseline
+        report['regressions'] = compare_to_baseline(
+            report['summary'], baseline.get('summary', baseline), args.tolerance)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Report written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'config': report['config'], 'summary': report['summary']}, f, indent=2)
+        print(f"✅ Baseline written to {args.save_baseline}")
+
+    print("\n📊 Summary:")
+    for name, value in report['summary'].items():
+        print(f"  {name}: {value:.2f}")
+
+    regressions = report.get('regressions', [])
+    if regressions:
+        print("\n❌ Regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    elif args.baseline:
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
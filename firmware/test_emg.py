@@ -0,0 +1,129 @@
+"""
+Tests for EMG frame decoding and windowed features.
+
+Run with:
+    python -m pytest test_emg.py
+"""
+
+import numpy as np
+
+from emg import (EMGFeatures, EMGIngest, FileEMGSource, FrameDecoder, RingBuffer,
+                 compute_features, encode_frames)
+
+CHANNELS = 4
+
+
+def _samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-500, 500, size=(n, CHANNELS)).astype(np.int16)
+
+
+def test_decoder_split_feeds():
+    samples = _samples(50)
+    data = encode_frames(samples)
+    decoder = FrameDecoder(CHANNELS)
+
+    # Feed in pieces that cut frames in half
+    blocks = [decoder.feed(data[i:i + 7]) for i in range(0, len(data), 7)]
+
+    np.testing.assert_array_equal(np.concatenate(blocks), samples)
+    assert decoder.dropped_samples == 0
+    assert decoder.resyncs == 0
+
+
+def test_decoder_resyncs_after_garbage():
+    samples = _samples(20)
+    first, second = encode_frames(samples[:10]), encode_frames(samples[10:], start_counter=10)
+    decoder = FrameDecoder(CHANNELS)
+
+    decoded = decoder.feed(first + b"\x00\x01\x02" + second)
+
+    np.testing.assert_array_equal(decoded, samples)
+    assert decoder.resyncs >= 1
+    assert decoder.dropped_samples == 0
+
+
+def test_decoder_counts_counter_gaps():
+    samples = _samples(30)
+    decoder = FrameDecoder(CHANNELS)
+
+    decoder.feed(encode_frames(samples[:10], start_counter=0))
+    decoder.feed(encode_frames(samples[10:20], start_counter=13))  # 3 lost
+    assert decoder.dropped_samples == 3
+
+    # Gaps across the 16-bit counter wrap are counted too
+    decoder = FrameDecoder(CHANNELS)
+    decoder.feed(encode_frames(samples[:10], start_counter=65530))  # Ends at 3
+    decoder.feed(encode_frames(samples[10:20], start_counter=6))
+    assert decoder.dropped_samples == 2
+
+
+def _direct(history: RingBuffer, window: int, zc_threshold: float):
+    """Features recomputed from scratch over the newest window"""
+    _, extended = history.latest(window + 1)
+    previous = None
+    if len(extended) > window:
+        previous, extended = extended[0], extended[1:]
+    return compute_features(extended, zc_threshold, previous)
+
+
+def _assert_features_equal(incremental, direct):
+    np.testing.assert_allclose(incremental['rms'], direct['rms'], rtol=1e-4)
+    np.testing.assert_allclose(incremental['mav'], direct['mav'], rtol=1e-4)
+    np.testing.assert_array_equal(incremental['zc'], direct['zc'])
+
+
+def test_incremental_features_match_direct():
+    window = 50
+    rng = np.random.default_rng(1)
+    for zc_threshold in (0.0, 100.0):
+        features = EMGFeatures(CHANNELS, window=window, zc_threshold=zc_threshold)
+        cleaned = RingBuffer(1000, CHANNELS)
+        t = 0.0
+        # Block sizes from single samples up to more than a window
+        for size in rng.integers(1, 2 * window, size=60):
+            block = rng.normal(0, 300, size=(size, CHANNELS)).astype(np.float32)
+            times = t + np.arange(size) * 0.001
+            t = times[-1] + 0.001
+            out = features.update(block, times)
+            cleaned.write(out, times[-len(out):])
+
+            _assert_features_equal(features.latest(), _direct(cleaned, window, zc_threshold))
+
+
+def test_features_at_matches_latest(tmp_path):
+    path = str(tmp_path / "emg.npy")
+    np.save(path, _samples(2000, seed=2))
+
+    # Replay far faster than real time; timestamps still use 1 kHz
+    source = FileEMGSource(path, CHANNELS, sample_rate=1e6, block_ms=0.037)
+    ingest = EMGIngest(source, CHANNELS, window=200)
+    ingest.running = True
+    ingest._ingest_loop()
+
+    assert ingest.buffer.total == 2000
+    _assert_features_equal(ingest.latest_features(), ingest.features_at(ingest.last_sample_time))
+
+
+def test_ingest_keeps_blocks_longer_than_window(tmp_path):
+    path = str(tmp_path / "emg.npy")
+    samples = _samples(2000, seed=3)
+    np.save(path, samples)
+
+    # Each read returns 500 samples, a backlog longer than the 200-sample window
+    source = FileEMGSource(path, CHANNELS, sample_rate=1e6, block_ms=0.5)
+    ingest = EMGIngest(source, CHANNELS, window=200)
+    ingest.running = True
+    ingest._ingest_loop()
+
+    assert ingest.blocks == 4
+    assert ingest.buffer.total == 2000
+    times, cleaned = ingest.buffer.latest(2000)
+    np.testing.assert_allclose(np.diff(times), ingest.sample_period, rtol=1e-6)
+    assert times[-1] == ingest.last_sample_time
+
+    # Every sample is kept in order: only the per-block baseline was removed
+    offsets = (samples - cleaned).reshape(4, 500, CHANNELS)
+    np.testing.assert_allclose(offsets, offsets[:, :1].repeat(500, axis=1), atol=1e-2)
+
+    _assert_features_equal(ingest.latest_features(), ingest.features_at(ingest.last_sample_time))
@@ -0,0 +1,104 @@
+"""
+Latency traces and a simulated serial device.
+
+Kept free of OpenCV, MediaPipe and pyserial so transports and benchmarks
+can time commands without pulling in the tracking pipeline. latency.py
+builds its glass-to-servo measurements on these.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Pipeline stages in the order a frame passes through them
+STAGES = ['capture', 'process', 'filter', 'queued', 'write', 'echo']
+
+
+class LatencyTrace:
+    """Timestamps for one frame on its way to the servos"""
+
+    __slots__ = ('seq', 'marks')
+
+    def __init__(self, seq: int, capture_time: Optional[float] = None):
+        """
+        Args:
+            seq: Frame sequence number
+            capture_time: perf_counter time the frame was grabbed
+        """
+        self.seq = seq
+        self.marks = {'capture': time.perf_counter() if capture_time is None else capture_time}
+
+    def mark(self, stage: str):
+        """Record the time this frame reached a stage"""
+        self.marks[stage] = time.perf_counter()
+
+    def elapsed(self, start: str, end: str) -> Optional[float]:
+        """
+        Get the time between two stages
+        Returns:
+            Seconds between the stages, or None if either was not reached
+        """
+        if start in self.marks and end in self.marks:
+            return self.marks[end] - self.marks[start]
+        return None
+
+
+class SimulatedDevice:
+    """
+    Serial-port stand-in that acknowledges every command line
+
+    Models the time the line takes to cross the UART at the configured baud
+    rate plus a processing delay on the device before it answers.
+    """
+
+    def __init__(self, baudrate: int = 115200, response_delay: float = 0.002,
+                 jitter: float = 0.0005):
+        """
+        Args:
+            baudrate: Simulated line speed
+            response_delay: Device processing time before it answers
+            jitter: Maximum random extra processing time
+        """
+        self.byte_time = 10.0 / baudrate  # start + 8 data + stop bits
+        self.response_delay = response_delay
+        self.jitter = jitter
+        self.is_open = True
+
+        self._lock = threading.Lock()
+        self._responses = deque()  # (due_time, line)
+        self._tx_free_at = 0.0
+
+    def write(self, data: bytes) -> int:
+        """Accept bytes from the PC and schedule the device's answers"""
+        now = time.perf_counter()
+        with self._lock:
+            start = max(now, self._tx_free_at)
+            self._tx_free_at = start + len(data) * self.byte_time
+
+            for line in data.splitlines():
+                response = b"OK " + line + b"\n"
+                due = (self._tx_free_at + self.response_delay +
+                       random.uniform(0, self.jitter) + len(response) * self.byte_time)
+                self._responses.append((due, response))
+        return len(data)
+
+    @property
+    def in_waiting(self) -> int:
+        """Bytes of answers that have arrived"""
+        now = time.perf_counter()
+        with self._lock:
+            return sum(len(r) for due, r in self._responses if due <= now)
+
+    def readline(self) -> bytes:
+        """Read one arrived answer"""
+        now = time.perf_counter()
+        with self._lock:
+            if self._responses and self._responses[0][0] <= now:
+                return self._responses.popleft()[1]
+        return b""
+
+    def close(self):
+        """Close the simulated port"""
+        self.is_open = False
@@ -0,0 +1,689 @@
+"""
+Network transports for driving the ESP32-CAM over Wi-Fi.
+
+UDPTransport and WebSocketTransport have the same send_angles interface as
+pc_ver.SerialCommunicator, so the tracking loop doesn't care which link is
+used. Every command carries a sequence number and the device acknowledges
+it, which gives loss, reordering and round-trip time statistics.
+
+Wire format (text, one command per datagram or message):
+    PC -> device:  "<seq> MIMIC a,b,c,d,e"
+    device -> PC:  "ACK <seq>"
+The device should ignore any command whose sequence number is not newer than
+the last one it applied, so late datagrams never move the servos backwards.
+
+LoopbackUDPDevice and LoopbackWebSocketDevice stand in for the board on
+127.0.0.1, optionally adding loss and delay, and the bench command compares
+the links side by side:
+    python transport.py --transports serial udp ws --count 2000 --rate 100
+
+Requirements:
+- numpy
+- websockets (optional, for the WebSocket transport)
+"""
+
+import argparse
+import contextlib
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from websockets.sync.client import connect as ws_connect
+    from websockets.sync.server import serve as ws_serve
+except ImportError:
+    ws_connect = None
+    ws_serve = None
+
+DEFAULT_UDP_PORT = 4210
+DEFAULT_WS_PORT = 81
+
+
+def format_packet(seq: int, angles: List[int]) -> bytes:
+    """Encode a sequence-numbered MIMIC command"""
+    return f"{seq} MIMIC {','.join(map(str, angles))}".encode()
+
+
+def parse_ack(data: bytes) -> Optional[int]:
+    """
+    Decode an acknowledgement
+    Returns:
+        The acknowledged sequence number, or None if the message is not an ACK
+    """
+    parts = data.split()
+    if len(parts) >= 2 and parts[0] == b"ACK":
+        try:
+            return int(parts[1])
+        except ValueError:
+            return None
+    return None
+
+
+class LinkStats:
+    """Loss, reordering and round-trip time for a sequence-numbered link"""
+
+    def __init__(self, ack_timeout: float = 1.0, window: int = 1000):
+        """
+        Args:
+            ack_timeout: Seconds after which an unacknowledged command counts as lost
+            window: Number of round-trip times kept for percentiles
+        """
+        self.ack_timeout = ack_timeout
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all counters"""
+        with self.lock:
+            self.in_flight: "OrderedDict[int, Tuple[float, object]]" = OrderedDict()
+            self.rtts: List[float] = []
+            self.sent = 0
+            self.acked = 0
+            self.lost = 0
+            self.reordered = 0
+            self.duplicates = 0
+            self.highest_acked = -1
+
+    def on_send(self, seq: int, trace=None):
+        """Record a command leaving the PC"""
+        now = time.perf_counter()
+        with self.lock:
+            self.sent += 1
+            self.in_flight[seq] = (now, trace)
+            self._expire(now)
+
+    def on_ack(self, seq: int):
+        """Record an acknowledgement from the device"""
+        now = time.perf_counter()
+        with self.lock:
+            entry = self.in_flight.pop(seq, None)
+            if entry is None:
+                # Already acknowledged, or given up on as lost
+                self.duplicates += 1
+                return
+
+            sent_time, trace = entry
+            self.acked += 1
+            self.rtts.append(now - sent_time)
+            if len(self.rtts) > self.window:
+                del self.rtts[:len(self.rtts) - self.window]
+
+            if seq < self.highest_acked:
+                self.reordered += 1
+            else:
+                self.highest_acked = seq
+
+        if trace is not None:
+            trace.mark('echo')
+
+    def _expire(self, now: float):
+        """Count commands past the timeout as lost (lock held)"""
+        while self.in_flight:
+            seq, (sent_time, _) = next(iter(self.in_flight.items()))
+            if now - sent_time < self.ack_timeout:
+                break
+            self.in_flight.popitem(last=False)
+            self.lost += 1
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Get link statistics
+        Returns:
+            Dict of counters, loss/reorder rates and RTT percentiles in ms
+        """
+        with self.lock:
+            self._expire(time.perf_counter())
+            rtts = np.array(self.rtts) * 1000
+            settled = self.acked + self.lost
+            result = {
+                'sent': self.sent,
+                'acked': self.acked,
+                'lost': self.lost,
+                'in_flight': len(self.in_flight),
+                'reordered': self.reordered,
+                'duplicates': self.duplicates,
+                'loss_rate': self.lost / settled if settled else 0.0,
+                'reorder_rate': self.reordered / self.acked if self.acked else 0.0,
+            }
+        if len(rtts):
+            result.update({
+                'rtt_mean_ms': float(rtts.mean()),
+                'rtt_p50_ms': float(np.percentile(rtts, 50)),
+                'rtt_p95_ms': float(np.percentile(rtts, 95)),
+                'rtt_p99_ms': float(np.percentile(rtts, 99)),
+            })
+        return result
+
+
+class NetworkTransport:
+    """Shared rate limiting and sequencing for network transports"""
+
+    label = "Network"
+
+    def __init__(self, host: str, port: int, ack_timeout: float = 1.0):
+        """
+        Args:
+            host: Device address
+            port: Device port
+            ack_timeout: Seconds after which an unacknowledged command counts as lost
+        """
+        self.host = host
+        self.port = port
+        self.connected = False
+        self.last_send_time = 0
+        self.send_interval = 0.15  # Same default as SerialCommunicator
+        self.verbose = False
+        self.seq = 0
+        self.stats = LinkStats(ack_timeout)
+        self._receiver = None
+
+    def send_angles(self, angles: List[int], trace=None) -> bool:
+        """
+        Send finger angles to the device
+        Args:
+            angles: List of 5 finger angles (0-180°)
+            trace: Optional latency trace stamped as the command moves along
+        Returns:
+            True if the command was sent
+        """
+        current_time = time.time()
+
+        # Rate limiting
+        if current_time - self.last_send_time < self.send_interval:
+            return False
+        self.last_send_time = current_time
+
+        if trace is not None:
+            trace.mark('queued')
+
+        if not self.connected:
+            print(f"🤖 Would send: MIMIC {','.join(map(str, angles))}")
+            return True
+
+        return self._send(angles, trace)
+
+    def _send(self, angles: List[int], trace) -> bool:
+        """Hand a command to the link (transmits immediately by default)"""
+        return self._transmit(angles, trace)
+
+    def _transmit(self, angles: List[int], trace) -> bool:
+        """
+        Number, record and write one command at the moment it goes on the wire
+        Returns:
+            True if the command was written
+        """
+        self.seq += 1
+        seq = self.seq
+        self.stats.on_send(seq, trace)
+        if not self._write(format_packet(seq, angles)):
+            return False
+        if trace is not None:
+            trace.mark('write')
+        if self.verbose:
+            print(f"📤 Sent #{seq}: {angles}")
+        return True
+
+    def _write(self, packet: bytes) -> bool:
+        raise NotImplementedError
+
+    def _handle_reply(self, data: bytes):
+        """Process one message from the device"""
+        seq = parse_ack(data)
+        if seq is not None:
+            self.stats.on_ack(seq)
+        elif self.verbose:
+            print(f"📥 ESP32: {data.decode(errors='replace').strip()}")
+
+    def _start_receiver(self, target):
+        self._receiver = threading.Thread(target=target, daemon=True)
+        self._receiver.start()
+
+    @staticmethod
+    def _join(*threads: Optional[threading.Thread], timeout: float = 1.0):
+        """Wait for background threads to finish after the link is closed"""
+        for thread in threads:
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(timeout=timeout)
+
+
+class UDPTransport(NetworkTransport):
+    """
+    Sequence-numbered UDP datagrams
+
+    Each command is a single datagram, so a lost or late packet never delays
+    the next one; the device simply applies the newest sequence number.
+    """
+
+    label = "UDP"
+
+    def __init__(self, host: str, port: int = DEFAULT_UDP_PORT, ack_timeout: float = 1.0):
+        super().__init__(host, port, ack_timeout)
+        self.sock = None
+
+    def connect(self) -> bool:
+        """
+        Open the UDP socket
+        Returns:
+            True if the socket is ready
+        """
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # connect() only fixes the peer, so ICMP errors surface on recv
+            self.sock.connect((self.host, self.port))
+            self.sock.settimeout(0.2)
+        except OSError as e:
+            print(f"❌ Failed to open UDP socket to {self.host}:{self.port}: {e}")
+            return False
+
+        self.connected = True
+        self._start_receiver(self._receive_loop)
+        print(f"✅ Sending UDP to {self.host}:{self.port}")
+        return True
+
+    def disconnect(self):
+        """Close the socket"""
+        if self.connected:
+            self.connected = False
+            self.sock.close()
+            self._join(self._receiver)
+            print(f"🔌 Closed UDP link to {self.host}:{self.port}")
+
+    def _write(self, packet: bytes) -> bool:
+        try:
+            self.sock.send(packet)
+            return True
+        except OSError as e:
+            # Datagrams are fire-and-forget; the next one replaces this one
+            if self.verbose:
+                print(f"⚠️ UDP send failed: {e}")
+            return False
+
+    def _receive_loop(self):
+        """Background thread reading acknowledgements"""
+        while self.connected:
+            try:
+                data = self.sock.recv(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self.connected:
+                    break
+                # e.g. ICMP port unreachable while the device reboots
+                time.sleep(0.05)
+                continue
+            self._handle_reply(data)
+
+
+class WebSocketTransport(NetworkTransport):
+    """
+    WebSocket link with a latest-wins send slot
+
+    TCP delivers in order, so a stall holds up everything behind it. Only
+    the newest setpoint waits in the send slot; older ones are replaced
+    (counted in coalesced) rather than queued. Sequence numbers, link stats
+    and the 'write' trace mark are assigned when the sender thread actually
+    sends, so replaced setpoints never count as sent or lost.
+    """
+
+    label = "WS"
+
+    def __init__(self, host: str, port: int = DEFAULT_WS_PORT, path: str = "/",
+                 ack_timeout: float = 1.0):
+        super().__init__(host, port, ack_timeout)
+        self.url = f"ws://{host}:{port}{path}"
+        self.ws = None
+        self._ws_stack: Optional[contextlib.ExitStack] = None
+        self.coalesced = 0
+        self._pending: Optional[Tuple[List[int], object]] = None
+        self._pending_lock = threading.Lock()
+        self._pending_event = threading.Event()
+        self._sender = None
+
+    def connect(self) -> bool:
+        """
+        Open the WebSocket connection
+        Returns:
+            True if connected
+        """
+        if ws_connect is None:
+            print("❌ WebSocket transport needs the 'websockets' package")
+            return False
+
+        # connect() is entered as a context manager, the form websockets
+        # supports going forward; the stack closes it in disconnect()
+        stack = contextlib.ExitStack()
+        try:
+            self.ws = stack.enter_context(ws_connect(self.url, open_timeout=5, compression=None))
+            self.ws.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception as e:
+            stack.close()
+            self.ws = None
+            print(f"❌ Failed to connect to {self.url}: {e}")
+            return False
+        self._ws_stack = stack
+
+        self.connected = True
+        self._start_receiver(self._receive_loop)
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+        print(f"✅ Connected to {self.url}")
+        return True
+
+    def disconnect(self):
+        """Close the connection and wait for the sender and receiver threads"""
+        if self._ws_stack is None:
+            return
+        # The threads may already have stopped on a send or receive error
+        self.connected = False
+        self._pending_event.set()
+        self._ws_stack.close()
+        self._ws_stack = None
+        self._join(self._sender, self._receiver)
+        print(f"🔌 Disconnected from {self.url}")
+
+    def _send(self, angles: List[int], trace) -> bool:
+        with self._pending_lock:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = (angles, trace)
+        self._pending_event.set()
+        return True
+
+    def _write(self, packet: bytes) -> bool:
+        self.ws.send(packet.decode())
+        return True
+
+    def _send_loop(self):
+        """Background thread sending the newest setpoint"""
+        while self.connected:
+            self._pending_event.wait()
+            self._pending_event.clear()
+            with self._pending_lock:
+                pending, self._pending = self._pending, None
+            if pending is None:
+                continue
+            try:
+                self._transmit(*pending)
+            except Exception as e:
+                if self.connected:
+                    print(f"❌ WebSocket send error: {e}")
+                    self.connected = False
+                break
+
+    def _receive_loop(self):
+        """Background thread reading acknowledgements"""
+        while self.connected:
+            try:
+                message = self.ws.recv()
+            except Exception:
+                break
+            self._handle_reply(message.encode() if isinstance(message, str) else message)
+
+
+class LoopbackUDPDevice:
+    """
+    Local UDP stand-in for the ESP32-CAM
+
+    Acknowledges every datagram and applies only the newest sequence number.
+    Loss and one-way delay can be simulated to exercise the statistics.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, loss: float = 0.0,
+                 delay: float = 0.0, jitter: float = 0.0):
+        """
+        Args:
+            host: Address to bind
+            port: Port to bind (0 picks a free port)
+            loss: Probability of dropping each datagram
+            delay: One-way delay in seconds added before acknowledging
+            jitter: Maximum random extra delay, which reorders datagrams
+        """
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.running = False
+
+        self.last_seq = 0
+        self.applied = 0
+        self.stale = 0
+        self.angles: Optional[str] = None
+        self._scheduled = []  # heap of (due, order, data, addr)
+        self._order = itertools.count()
+        self._thread = None
+
+    def start(self) -> 'LoopbackUDPDevice':
+        self.running = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self._thread.join(timeout=1)
+        self.sock.close()
+
+    def _apply(self, data: bytes, addr):
+        parts = data.split(b" ", 2)
+        try:
+            seq = int(parts[0])
+        except (ValueError, IndexError):
+            return
+
+        if seq > self.last_seq:
+            self.last_seq = seq
+            self.applied += 1
+            self.angles = parts[2].decode() if len(parts) > 2 else None
+        else:
+            self.stale += 1
+        self.sock.sendto(f"ACK {seq}".encode(), addr)
+
+    def _loop(self):
+        while self.running:
+            timeout = 0.05
+            if self._scheduled:
+                # A zero timeout would make the socket non-blocking
+                timeout = max(0.0005, min(timeout, self._scheduled[0][0] - time.perf_counter()))
+            self.sock.settimeout(timeout)
+
+            try:
+                data, addr = self.sock.recvfrom(512)
+                if random.random() >= self.loss:
+                    due = time.perf_counter() + self.delay + random.uniform(0, self.jitter)
+                    heapq.heappush(self._scheduled, (due, next(self._order), data, addr))
+            except socket.timeout:
+                pass
+            except OSError:
+                break
+
+            now = time.perf_counter()
+            while self._scheduled and self._scheduled[0][0] <= now:
+                _, _, data, addr = heapq.heappop(self._scheduled)
+                self._apply(data, addr)
+
+
+class LoopbackWebSocketDevice:
+    """Local WebSocket stand-in for the ESP32-CAM that acknowledges every command"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        if ws_serve is None:
+            raise RuntimeError("Loopback WebSocket device needs the 'websockets' package")
+        self.server = ws_serve(self._handler, host, port, compression=None)
+        self.address = self.server.socket.getsockname()
+        self.last_seq = 0
+        self.stale = 0
+        self._thread = None
+
+    def _handler(self, websocket):
+        for message in websocket:
+            seq = int(message.split(" ", 1)[0])
+            if seq > self.last_seq:
+                self.last_seq = seq
+            else:
+                self.stale += 1
+            websocket.send(f"ACK {seq}")
+
+    def start(self) -> 'LoopbackWebSocketDevice':
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self._thread.join(timeout=1)
+
+
+def _bench_one(name: str, comm, count: int, rate: float) -> Dict[str, object]:
+    """
+    Send count commands at the given rate through one transport
+    Returns:
+        Dict of throughput and latency results
+    """
+    from tracing import LatencyTrace
+
+    comm.send_interval = 0
+    comm.verbose = False
+    traces = []
+    period = 1.0 / rate if rate > 0 else 0.0
+
+    start = time.perf_counter()
+    next_time = start
+    for i in range(count):
+        if period:
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            next_time += period
+        trace = LatencyTrace(i)
+        angles = [(i + k * 30) % 181 for k in range(5)]
+        if comm.send_angles(angles, trace):
+            traces.append(trace)
+    send_elapsed = time.perf_counter() - start
+
+    # Let outstanding answers arrive
+    time.sleep(0.5)
+
+    # Commands replaced in a latest-wins slot never reached the wire
+    traces = [t for t in traces if t.elapsed('queued', 'write') is not None]
+
+    rtts = np.array([t.elapsed('queued', 'echo') for t in traces
+                     if t.elapsed('queued', 'echo') is not None]) * 1000
+    send_costs = np.array([t.elapsed('queued', 'write') for t in traces
+                           if t.elapsed('queued', 'write') is not None]) * 1e6
+
+    result = {
+        'transport': name,
+        'commands': len(traces),
+        'answered': int(len(rtts)),
+        'send_rate_per_s': len(traces) / send_elapsed if send_elapsed > 0 else 0.0,
+    }
+    if len(send_costs):
+        result['send_call_mean_us'] = float(send_costs.mean())
+    if len(rtts):
+        result.update({
+            'rtt_p50_ms': float(np.percentile(rtts, 50)),
+            'rtt_p95_ms': float(np.percentile(rtts, 95)),
+            'rtt_p99_ms': float(np.percentile(rtts, 99)),
+        })
+    if isinstance(comm, WebSocketTransport):
+        result['coalesced'] = comm.coalesced
+    if isinstance(comm, NetworkTransport):
+        stats = comm.stats.summary()
+        result.update({k: stats[k] for k in ('lost', 'reordered', 'loss_rate', 'reorder_rate')})
+    return result
+
+
+def main():
+    """Benchmark serial and network transports side by side on loopback stand-ins"""
+    parser = argparse.ArgumentParser(description="Compare serial, UDP and WebSocket links")
+    parser.add_argument("--transports", nargs='+', choices=['serial', 'udp', 'ws'],
+                        default=['serial', 'udp', 'ws'])
+    parser.add_argument("--count", type=int, default=2000, help="Commands per transport")
+    parser.add_argument("--rate", type=float, default=100,
+                        help="Commands per second (0 = as fast as possible)")
+    parser.add_argument("--serial-port", default=None,
+                        help="Real serial port (default: simulated device)")
+    parser.add_argument("--host", default=None,
+                        help="Real device address for udp/ws (default: loopback stand-in)")
+    parser.add_argument("--loss", type=float, default=0.0, help="Stand-in UDP loss probability")
+    parser.add_argument("--delay", type=float, default=0.0, help="Stand-in UDP delay in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Stand-in UDP jitter in ms")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.transports:
+        device = None
+        if name == 'serial':
+            from tracing import SimulatedDevice
+            try:
+                from pc_ver import SerialCommunicator
+            except ImportError as e:
+                print(f"⚠️ Skipping serial: {e}")
+                continue
+
+            comm = SerialCommunicator()
+            comm.verbose = False
+            if args.serial_port:
+                if not comm.connect(args.serial_port):
+                    continue
+            else:
+                comm.attach(SimulatedDevice())
+        elif name == 'udp':
+            if args.host:
+                comm = UDPTransport(args.host)
+            else:
+                device = LoopbackUDPDevice(loss=args.loss, delay=args.delay / 1000,
+                                           jitter=args.jitter / 1000).start()
+                comm = UDPTransport(*device.address)
+            if not comm.connect():
+                continue
+        else:
+            if args.host:
+                comm = WebSocketTransport(args.host)
+            else:
+                if ws_serve is None:
+                    print("⚠️ Skipping ws: 'websockets' is not installed")
+                    continue
+                device = LoopbackWebSocketDevice().start()
+                comm = WebSocketTransport(*device.address)
+            if not comm.connect():
+                if device:
+                    device.stop()
+                continue
+
+        try:
+            results.append(_bench_one(name, comm, args.count, args.rate))
+        finally:
+            comm.disconnect()
+            if device:
+                device.stop()
+
+    print(f"\n📊 {args.count} commands at {args.rate:g}/s")
+    columns = ['commands', 'answered', 'send_rate_per_s', 'send_call_mean_us',
+               'rtt_p50_ms', 'rtt_p95_ms', 'rtt_p99_ms', 'lost', 'reordered', 'coalesced']
+    print(f"  {'':<10}" + "".join(f"{c:>18}" for c in columns))
+    for result in results:
+        cells = []
+        for c in columns:
+            value = result.get(c)
+            if value is None:
+                cells.append(f"{'-':>18}")
+            elif isinstance(value, float):
+                cells.append(f"{value:>18.3f}")
+            else:
+                cells.append(f"{value:>18}")
+        print(f"  {result['transport']:<10}" + "".join(cells))
+
+
+if __name__ == "__main__":
+    main()